@@ -1,12 +1,68 @@
+import atexit
+import cProfile
+import functools
+import json
 import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Optional
+from typing import Any, Callable, Iterator, List, Optional
 
 from absl import flags, logging as log
 
+import metrics
+
 FLAGS = flags.FLAGS
 CWD_LOG_DIR = "logs"
 
+flags.DEFINE_bool("log_json", False, "Write log records as json lines instead of the absl text format")
+flags.DEFINE_integer("log_every_n", 1, "Only log 1 of every n messages which are logged per item, e.g. per url")
+flags.DEFINE_string("profile", "", "Dump cProfile stats to this file, see `python -m pstats`")
+flags.DEFINE_string("trace", "", "Write the timing spans to this file in chrome trace format, e.g. for speedscope")
+
+
+class JsonFormatter(logging.Formatter):
+    """One json object per line, e.g. for jq or a log shipper"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        d = {
+            "time": record.created,
+            "level": record.levelname,
+            "file": record.filename,
+            "line": record.lineno,
+            "thread": record.thread,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            d["exception"] = self.formatException(record.exc_info)
+        return json.dumps(d, ensure_ascii=False)
+
+
+class lazy:
+    """Defer a call until its result is formatted into a log message.
+
+    log.debug("lyrics=%s", lazy(pformat, lyrics)) only pays for pformat when DEBUG is enabled.
+    """
+
+    def __init__(self, func: Callable, *args: Any, **kwargs: Any) -> None:
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+
+    def __str__(self) -> str:
+        return str(self.func(*self.args, **self.kwargs))
+
+
+def log_every_n(level: int, msg: str, *args: Any) -> None:
+    """Log 1 of every --log_every_n messages from the same line, for messages logged per item, e.g. per url"""
+    log.log_every_n(level, msg, FLAGS.log_every_n, *args)
+
+
+# report the caller instead of this module for the file:line, which is also the key of log_every_n.
+log.ABSLLogger.register_frame_to_skip(__file__, "log_every_n")
+
 
 def initialize_logging(log_dir: Optional[str] = None) -> None:
     """Initialize logging system"""
@@ -23,6 +79,8 @@ def initialize_logging(log_dir: Optional[str] = None) -> None:
     handler = log.get_absl_handler()
     handler.use_absl_log_file(log_dir=log_dir)
     log.use_absl_handler()
+    if FLAGS.log_json:
+        handler.setFormatter(JsonFormatter())
 
     # set alsologtostderr as default behavior.
     if not FLAGS["alsologtostderr"].present:
@@ -32,3 +90,81 @@ def initialize_logging(log_dir: Optional[str] = None) -> None:
     if not FLAGS["verbosity"].present:
         FLAGS["verbosity"].value = 0
         logging.root.setLevel(logging.INFO)
+
+    # CLI runs report the cache and latency metrics at exit.
+    atexit.register(metrics.log_summary)
+
+
+# ------------------------------------------------------------------------------
+# timing and profiling
+
+# chrome trace events of the spans, only collected within profiling(trace=...)
+_trace_events: Optional[List[dict]] = None
+
+SPAN_SECONDS = metrics.histogram("span_seconds", "Latency of the stages of the pipeline")
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Time a stage of the pipeline, reported with -v 1"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        log.vlog(1, "span %s took %.3fms", name, elapsed * 1000)
+        SPAN_SECONDS.observe(elapsed, span=name)
+        if _trace_events is not None:
+            _trace_events.append(
+                {
+                    "name": name,
+                    "ph": "X",
+                    "ts": start * 1e6,
+                    "dur": elapsed * 1e6,
+                    "pid": os.getpid(),
+                    "tid": threading.get_ident(),
+                }
+            )
+
+
+def timed(name: str) -> Callable:
+    """Decorator version of span"""
+
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+@contextmanager
+def profiling(profile: Optional[str] = None, trace: Optional[str] = None) -> Iterator[None]:
+    """Profile the block with cProfile into profile and/or collect its spans into trace"""
+    global _trace_events
+
+    if profile is None:
+        profile = FLAGS.profile
+    if trace is None:
+        trace = FLAGS.trace
+
+    profiler = cProfile.Profile() if profile else None
+    if trace:
+        _trace_events = []
+    if profiler:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(profile)
+            log.info(f"write cProfile stats to {profile}")
+        if trace:
+            with open(trace, "w") as out:
+                json.dump({"traceEvents": _trace_events}, out)
+            _trace_events = None
+            log.info(f"write trace to {trace}")
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+
+# vim: set fileencoding=utf-8 :
+
+import json
+import random
+import statistics
+import sys
+import tempfile
+import time
+from functools import partial
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import attr
+from absl import app, flags, logging as log
+from pptx import Presentation
+
+from base import initialize_logging
+from benchmarks import corpus
+from bible import scripture as bible_scripture
+from bible.books import extract_citations, verse_key
+from bible.coverage import Coverage, VerseSpace
+from bible.fulltext import FullTextIndex
+from bible.index import parse_citations
+from bible.shared import SharedBible, shared_scripture
+from hymns.fuzzy import hymn_index
+from mvccc.slides import extract_slides_text, mvccc_slides, search_hymn_ppt, to_pptx
+
+FLAGS = flags.FLAGS
+
+flags.DEFINE_string("bench_output", "logs/bench.json", "where to write the benchmark results")
+flags.DEFINE_string("bench_baseline", "", "compare the results against this earlier --bench_output")
+flags.DEFINE_float("bench_tolerance", 0.25, "allowed slow down relative to the baseline, 0.25 => 25%")
+flags.DEFINE_integer("bench_repeat", 20, "repeat each benchmark this many times")
+flags.DEFINE_integer("bench_hymns", 300, "number of synthetic hymn decks")
+flags.DEFINE_integer("bench_seed", 20190324, "random seed of the synthetic fixtures")
+flags.DEFINE_multi_string("bench_only", [], "only run benchmarks whose name starts with one of these")
+
+# synthetic books have at least 1 chapter and chapters have at least 15 verses.
+CITATIONS = "詩篇1:1-6;約翰福音1:14;1:6;羅馬書1:1-2;哥林多前書1:4-7,13"
+OUTLINE = "一、經文：詩篇 23:1-6；約翰福音3:16；14:6。二、參考 Rom 12:1-2 以及 林前13:4-7、13 等經文。\n" * 200
+
+
+@attr.s
+class Result:
+    name: str = attr.ib()
+    repeat: int = attr.ib()
+    min_ms: float = attr.ib()
+    median_ms: float = attr.ib()
+    mean_ms: float = attr.ib()
+
+
+def measure(name: str, func: Callable[[], object], repeat: int, setup: Optional[Callable[[], None]] = None) -> Result:
+    timings = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    result = Result(name, repeat, min(timings), statistics.median(timings), statistics.mean(timings))
+    log.info(f"{name:<28} median={result.median_ms:9.3f}ms min={result.min_ms:9.3f}ms")
+    return result
+
+
+def run_benchmarks(workdir: Path, repeat: int) -> Dict[str, Result]:
+    verses = list(corpus.make_verses(corpus.make_layout(FLAGS.bench_seed), FLAGS.bench_seed))
+    bible_text = corpus.write_ibibles_net(workdir / "books.txt", verses)
+    bible_epub = corpus.write_bible_cloud(workdir / "CMNUNV.epub", verses, footnotes=0.01)
+    processed = workdir / "processed"
+    corpus.make_hymn_decks(processed, FLAGS.master_pptx, FLAGS.bench_seed, FLAGS.bench_hymns)
+
+    def use_bible(filename: Path, source: str, cold: bool = True) -> Callable[[], None]:
+        def setup():
+            FLAGS.bible_text, FLAGS.bible_source = filename.as_posix(), source
+            if cold:
+                Path(f"{filename}.csv").unlink(missing_ok=True)
+            bible_scripture._load_scripture.cache_clear()
+
+        return setup
+
+    use_bible(bible_epub, "bible.cloud")()
+    bible = bible_scripture.scripture()
+    citations = list(parse_citations(CITATIONS).items())
+    index = FullTextIndex.build(bible)
+    space = VerseSpace.build([verse_key(v.book, v) for v in verses])
+    # 10 years of services with 4 passages each.
+    rnd = random.Random(FLAGS.bench_seed)
+    starts = [rnd.randrange(len(space)) for _ in range(52 * 10 * 4)]
+    preached = [(space.keys[i], space.keys[min(i + rnd.randint(0, 30), len(space) - 1)]) for i in starts]
+    decks = sorted(processed.glob("*.pptx"))
+    search_hymn = partial(search_hymn_ppt, basepath=processed)
+    hymn = search_hymn(decks[len(decks) // 2].stem)[0]
+    service = dict(
+        hymns=[deck.stem for deck in decks[2:6]],
+        scripture="詩篇1:1-6;約翰福音1:14",
+        memorize="約翰福音1:14",
+        message="信息",
+        messager="牧師",
+        choir=decks[6].stem,
+        response=decks[7].stem,
+        offering=decks[8].stem,
+        communion=True,
+    )
+
+    benchmarks = [
+        ("parse_citations", lambda: parse_citations(CITATIONS), None),
+        ("extract_citations", lambda: extract_citations(OUTLINE), None),
+        ("bible_search", lambda: bible.search(citations), None),
+        ("fulltext_build", lambda: FullTextIndex.build(bible), None),
+        ("fulltext_search", lambda: index.search("恩典 平安"), None),
+        ("coverage_books", lambda: Coverage.of(space, preached).books(), None),
+        ("scripture_cold_ibibles", bible_scripture.scripture, use_bible(bible_text, "ibibles.net")),
+        ("scripture_cold_epub", bible_scripture.scripture, use_bible(bible_epub, "bible.cloud")),
+        ("scripture_csv", bible_scripture.scripture, use_bible(bible_epub, "bible.cloud", cold=False)),
+        ("scripture_warm", bible_scripture.scripture, None),
+        ("shared_search", lambda: shared_scripture().search(citations), None),
+        # shared_scripture writes the .mmap if it is missing, attaching to it is what every other process pays.
+        ("scripture_shared_attach", lambda: SharedBible.attach(Path(f"{FLAGS.bible_text}.mmap")), shared_scripture),
+        ("search_hymn_ppt", lambda: search_hymn(hymn.filename[:-5]), None),
+        ("hymn_fuzzy_search", lambda: hymn_index(processed).search(hymn.filename[:-6] + "的"), None),
+        ("extract_slides_text", lambda: list(extract_slides_text(Presentation(decks[0].as_posix()))), None),
+        ("to_pptx", lambda: to_pptx([hymn] * 10, Presentation(FLAGS.master_pptx)), None),
+        ("mvccc_slides", lambda: mvccc_slides(**service, search_hymn=search_hymn), None),
+    ]
+
+    results: Dict[str, Result] = {}
+    for name, func, setup in benchmarks:
+        if FLAGS.bench_only and not name.startswith(tuple(FLAGS.bench_only)):
+            continue
+        # the cold load parses the whole bible, a few rounds are enough.
+        results[name] = measure(name, func, max(1, repeat // 5) if setup else repeat, setup)
+
+    return results
+
+
+def compare(results: Dict[str, Result], baseline: Dict[str, dict], tolerance: float) -> List[str]:
+    "names of the benchmarks which are slower than the baseline by more than tolerance"
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        base = baseline[name]["median_ms"]
+        ratio = result.median_ms / base if base else 1.0
+        log.info(f"{name:<28} {base:9.3f}ms => {result.median_ms:9.3f}ms ({ratio - 1:+.1%})")
+        if ratio > 1 + tolerance:
+            regressions.append(name)
+
+    return regressions
+
+
+def main(argv):
+    del argv
+
+    initialize_logging()
+    with tempfile.TemporaryDirectory(prefix="bench") as workdir:
+        results = run_benchmarks(Path(workdir), FLAGS.bench_repeat)
+
+    output = Path(FLAGS.bench_output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with output.open("w") as out:
+        json.dump({name: attr.asdict(result) for name, result in results.items()}, out, indent=2)
+    log.info(f"write benchmark results to {output}")
+
+    if FLAGS.bench_baseline:
+        with open(FLAGS.bench_baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, FLAGS.bench_tolerance)
+        if regressions:
+            log.error(f"regressions over {FLAGS.bench_tolerance:.0%} compared to {FLAGS.bench_baseline}: {regressions}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    app.run(main)
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+
+# vim: set fileencoding=utf-8 :
+
+"""Synthetic bibles and hymnals for testing and benchmarking without the downloaded sources.
+
+The bibles are written in the formats of download/CMNUNV.epub (bible.cloud) and download/cut/books.txt
+(ibibles.net), the hymns as pptx decks like processed/mvccc/{no:03d}_{title}.pptx.
+"""
+
+import random
+from concurrent.futures import ProcessPoolExecutor
+from html import escape
+from itertools import groupby
+from pathlib import Path
+from typing import Dict, Generator, List, Optional, Tuple
+from zipfile import ZIP_DEFLATED, ZIP_STORED, ZipFile
+
+from absl import app, flags, logging as log
+from pptx import Presentation
+
+from bible.books import BOOK_INDEX, load_books
+from bible.scripture import BibleVerse
+from mvccc.slides import Hymn, to_pptx
+
+FLAGS = flags.FLAGS
+
+CJK = "耶和華神主耶穌基督聖靈天地萬物光明黑暗生命真理道路恩典平安喜樂信心盼望慈愛公義聖潔榮耀讚美敬拜禱告"
+OT_BOOKS = 39
+
+# verse counts of each chapter of each book
+Layout = Dict[str, List[int]]
+
+
+def books(book_index: str = BOOK_INDEX) -> List[Tuple[str, str]]:
+    "[(cname, eabbr)] of all 66 books"
+    return [(book.cname, book.eabbr) for book in load_books(book_index)]
+
+
+def _text(rnd: random.Random, low: int, high: int) -> str:
+    return "".join(rnd.choice(CJK) for _ in range(rnd.randint(low, high)))
+
+
+def make_layout(seed: int, chapters: int = 30, verses: int = 30) -> Layout:
+    "random number of chapters (at most chapters) and verses per chapter (at most verses) of each book."
+    rnd = random.Random(seed)
+    return {
+        book: [rnd.randint(max(1, verses // 2), verses) for _ in range(rnd.randint(1, chapters))]
+        for book, _ in books()
+    }
+
+
+def make_verses(layout: Layout, seed: int, word_god: str = "上帝") -> Generator[BibleVerse, None, None]:
+    "one translation, different seed generates a different translation of the same layout."
+    rnd = random.Random(seed)
+    for book, chapters in layout.items():
+        for chapter, verses in enumerate(chapters, 1):
+            for verse in range(1, verses + 1):
+                text = _text(rnd, 10, 40)
+                if rnd.random() < 0.05:
+                    pos = rnd.randint(0, len(text))
+                    text = text[:pos] + word_god + text[pos:]
+                yield BibleVerse(book, chapter, verse, text)
+
+
+def write_ibibles_net(path: Path, verses: List[BibleVerse], merged: float = 0.0, seed: int = 0) -> Path:
+    "bible in the format of download/cut/books.txt, a fraction of merged verses are written as 見上節"
+    rnd = random.Random(seed)
+    codes = dict(books())
+    with path.open("w", encoding="utf-8-sig") as out:
+        book = None
+        for bv in verses:
+            if bv.book != book:
+                book = bv.book
+                out.write(f"=== {book}\n")
+            text = "見上節" if bv.verse > 1 and rnd.random() < merged else bv.text
+            out.write(f"{codes[bv.book]} {bv.chapter}:{bv.verse} {bv.book} {bv.chapter}:{bv.verse} {text}\n")
+        out.write("END\n")
+    return path
+
+
+EPUB_INDEX = """<?xml version="1.0" encoding="utf-8"?>
+<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops">
+<head><title>Synthetic Bible</title></head>
+<body>
+<div class="ot">{ot}</div>
+<div class="nt">{nt}</div>
+</body>
+</html>
+"""
+
+EPUB_BOOK = """<?xml version="1.0" encoding="utf-8"?>
+<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops">
+<head><title>{book}</title></head>
+<body>
+{body}
+</body>
+</html>
+"""
+
+EPUB_CONTAINER = """<?xml version="1.0" encoding="UTF-8"?>
+<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+<rootfiles><rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/></rootfiles>
+</container>
+"""
+
+EPUB_OPF = """<?xml version="1.0" encoding="utf-8"?>
+<package xmlns="http://www.idpf.org/2007/opf" version="3.0" unique-identifier="uid">
+<metadata xmlns:dc="http://purl.org/dc/elements/1.1/">
+<dc:identifier id="uid">synthetic-bible</dc:identifier><dc:title>Synthetic Bible</dc:title><dc:language>zh</dc:language>
+</metadata>
+<manifest>
+<item id="index" href="index.xhtml" media-type="application/xhtml+xml" properties="nav"/>
+{items}
+</manifest>
+<spine>
+<itemref idref="index"/>
+{itemrefs}
+</spine>
+</package>
+"""
+
+
+def write_bible_cloud(path: Path, verses: List[BibleVerse], footnotes: float = 0.0, seed: int = 0) -> Path:
+    "bible in the format of download/CMNUNV.epub, a fraction of verses get a footnote"
+    rnd = random.Random(seed)
+    codes = {book: f"{no:02d}" for no, (book, _) in enumerate(books(), 1)}
+
+    by_book: Dict[str, List[BibleVerse]] = {}
+    for bv in verses:
+        by_book.setdefault(bv.book, []).append(bv)
+
+    with ZipFile(path, "w") as zf:
+        zf.writestr("mimetype", "application/epub+zip", compress_type=ZIP_STORED)
+        zf.writestr("META-INF/container.xml", EPUB_CONTAINER, compress_type=ZIP_DEFLATED)
+
+        links = []
+        for book, book_verses in by_book.items():
+            code = codes[book]
+            paragraphs: List[str] = []
+            asides: List[str] = []
+            for chapter, chapter_verses in groupby(book_verses, key=lambda bv: bv.chapter):
+                spans = []
+                for bv in chapter_verses:
+                    text = escape(bv.text)
+                    if rnd.random() < footnotes:
+                        text += "*"
+                        asides.append(
+                            f"<aside epub:type='footnote'><p class=\"f\">"
+                            f'<a class="notebackref" href="#{code}{chapter}_{bv.verse}">'
+                            f'<span class="notemark">*</span> {chapter}:{bv.verse}:</a>'
+                            f'<span class="ft">或譯：{escape(_text(rnd, 4, 8))}</span></p></aside>'
+                        )
+                    spans.append(f'<span class="verse" id="{code}{chapter}_{bv.verse}">{bv.verse}\xa0</span>{text}')
+                paragraphs.append(f'<div class="c">{chapter}</div>\n<div class="p">{"".join(spans)}</div>')
+
+            body = "\n".join(paragraphs + asides)
+            href = f"{code}.xhtml"
+            zf.writestr(f"OEBPS/{href}", EPUB_BOOK.format(book=book, body=body), compress_type=ZIP_DEFLATED)
+            klass = "oo" if int(code) <= OT_BOOKS else "nn"
+            links.append((klass, f'<a class="{klass}" href="{href}">{book}</a>'))
+
+        ot = "\n".join(link for klass, link in links if klass == "oo")
+        nt = "\n".join(link for klass, link in links if klass == "nn")
+        zf.writestr("OEBPS/index.xhtml", EPUB_INDEX.format(ot=ot, nt=nt), compress_type=ZIP_DEFLATED)
+        items = "\n".join(
+            f'<item id="b{codes[book]}" href="{codes[book]}.xhtml" media-type="application/xhtml+xml"/>'
+            for book in by_book
+        )
+        itemrefs = "\n".join(f'<itemref idref="b{codes[book]}"/>' for book in by_book)
+        zf.writestr("OEBPS/content.opf", EPUB_OPF.format(items=items, itemrefs=itemrefs), compress_type=ZIP_DEFLATED)
+
+    return path
+
+
+# ------------------------------------------------------------------------------
+
+
+def hymn_titles(seed: int, total: int) -> List[str]:
+    "unique titles, the hymns used by every service come first."
+    rnd = random.Random(seed)
+    titles = ["聖哉聖哉聖哉", "三一頌"]
+    seen = set(titles)
+    while len(titles) < total:
+        title = _text(rnd, 4, 10)
+        if title not in seen:
+            seen.add(title)
+            titles.append(title)
+    return titles[:total]
+
+
+def hymn_lyrics(seed: int, no: int, title: str) -> List[Tuple[int, List[List[str]]]]:
+    "lyrics in the shape of extract_slides_text(), one slide per paragraph."
+    rnd = random.Random(seed * 100003 + no)
+    return [(idx, [[f"#{no}{title}"], [_text(rnd, 8, 14) for _ in range(4)]]) for idx in range(rnd.randint(2, 6))]
+
+
+def write_hymn_deck(path: Path, master_pptx: str, lyrics: List[Tuple[int, List[List[str]]]]) -> Path:
+    ppt = to_pptx([Hymn(path.name, lyrics)], Presentation(master_pptx))
+    ppt.save(path.as_posix())
+    return path
+
+
+def make_hymn_decks(
+    basepath: Path,
+    master_pptx: str,
+    seed: int,
+    total: int,
+    duplicates: float = 0.0,
+    workers: Optional[int] = None,
+) -> List[Path]:
+    """Hymn decks {no:03d}_{title}.pptx under basepath.
+
+    A fraction of the hymns get a near duplicate {no:03d}_{title}-1.pptx with one line of lyrics changed.
+    """
+    basepath.mkdir(parents=True, exist_ok=True)
+    rnd = random.Random(seed)
+
+    jobs = []
+    for no, title in enumerate(hymn_titles(seed, total), 1):
+        lyrics = hymn_lyrics(seed, no, title)
+        jobs.append((basepath / f"{no:03d}_{title}.pptx", lyrics))
+        if rnd.random() < duplicates:
+            copy = [(idx, [head, list(lines)]) for idx, (head, lines) in lyrics]
+            copy[-1][1][1][-1] = _text(rnd, 8, 14)
+            jobs.append((basepath / f"{no:03d}_{title}-1.pptx", copy))
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(write_hymn_deck, path, master_pptx, lyrics) for path, lyrics in jobs]
+        return [future.result() for future in futures]
+
+
+# ------------------------------------------------------------------------------
+
+
+def make_corpus(
+    basedir: Path,
+    seed: int,
+    translations: int = 1,
+    chapters: int = 30,
+    verses: int = 30,
+    hymns: int = 300,
+    duplicates: float = 0.0,
+    master_pptx: str = "mvccc_master.pptx",
+) -> Dict[str, List[Path]]:
+    """Generate bibles and hymns under basedir.
+
+    basedir/bible/CMNUNV{n}.epub, basedir/bible/books{n}.txt for each translation n, all of them share one layout.
+    basedir/processed/mvccc/*.pptx
+    """
+    bible_dir = basedir / "bible"
+    bible_dir.mkdir(parents=True, exist_ok=True)
+
+    layout = make_layout(seed, chapters, verses)
+    result: Dict[str, List[Path]] = {"bible.cloud": [], "ibibles.net": [], "hymns": []}
+    for n in range(translations):
+        verses_n = list(make_verses(layout, seed + n, word_god="上帝" if n % 2 == 0 else "　神"))
+        epub = write_bible_cloud(bible_dir / f"CMNUNV{n}.epub", verses_n, footnotes=0.01, seed=seed + n)
+        text = write_ibibles_net(bible_dir / f"books{n}.txt", verses_n, merged=0.002, seed=seed + n)
+        result["bible.cloud"].append(epub)
+        result["ibibles.net"].append(text)
+        log.info(f"generated {len(verses_n)} verses to {epub} and {text}")
+
+    result["hymns"] = make_hymn_decks(basedir / "processed" / "mvccc", master_pptx, seed, hymns, duplicates)
+    log.info(f"generated {len(result['hymns'])} hymn decks to {basedir / 'processed' / 'mvccc'}")
+
+    return result
+
+
+if __name__ == "__main__":
+    from base import initialize_logging
+
+    flags.DEFINE_string("corpus_dir", "synthetic", "where to generate the corpus")
+    flags.DEFINE_integer("corpus_seed", 20190324, "random seed")
+    flags.DEFINE_integer("corpus_translations", 1, "number of bible translations")
+    flags.DEFINE_integer("corpus_chapters", 30, "max number of chapters per book")
+    flags.DEFINE_integer("corpus_verses", 30, "max number of verses per chapter")
+    flags.DEFINE_integer("corpus_hymns", 300, "number of hymns")
+    flags.DEFINE_float("corpus_duplicates", 0.05, "fraction of hymns with a near duplicate deck")
+
+    def main(_):
+        initialize_logging()
+        make_corpus(
+            Path(FLAGS.corpus_dir),
+            FLAGS.corpus_seed,
+            translations=FLAGS.corpus_translations,
+            chapters=FLAGS.corpus_chapters,
+            verses=FLAGS.corpus_verses,
+            hymns=FLAGS.corpus_hymns,
+            duplicates=FLAGS.corpus_duplicates,
+            master_pptx=FLAGS.master_pptx,
+        )
+
+    app.run(main)
@@ -0,0 +1,156 @@
+"""Align verses of several bible sources, report the differences and show parallel text.
+
+Every verse of every source is mapped to one integer key (see bible.books.verse_keys), so sources are aligned
+with sorted array operations instead of merging DataFrames.
+"""
+
+from typing import TYPE_CHECKING, Dict, List, NamedTuple, Optional
+
+import attr
+import numpy as np
+from absl import app, flags, logging as log
+
+from base import initialize_logging, span
+from bible.books import from_key, verse_key, verse_keys
+from bible.fulltext import normalize
+from bible.index import BookCitations, VerseCounts, parse_citations, validate_citations
+
+if TYPE_CHECKING:
+    from bible.scripture import Bible
+
+FLAGS = flags.FLAGS
+
+flags.DEFINE_multi_string(
+    "bible_sources",
+    ["ibibles.net:download/cut/books.txt", "bible.cloud:download/CMNUNV.epub"],
+    "bible sources to align, in the form of {bible_source}:{bible_text}",
+)
+
+MISSING = "missing"
+# 見上節, the text of the verse is merged into the previous verse, ibibles.net keeps it as an empty verse.
+MERGED = "merged"
+DIFFER = "differ"
+
+
+class VerseDiff(NamedTuple):
+    book: str
+    chapter: int
+    verse: int
+    kind: str  # MISSING, MERGED, DIFFER or empty if the sources agree
+    texts: Dict[str, Optional[str]]  # source => text, None if missing
+
+
+def _kind(texts: Dict[str, Optional[str]]) -> str:
+    values = set(texts.values())
+    if None in values:
+        return MISSING
+    if "" in values:
+        return MERGED
+    if len({normalize(text) for text in values}) > 1:  # type: ignore
+        return DIFFER
+    return ""
+
+
+@attr.s
+class Alignment:
+    names: List[str] = attr.ib()
+    keys: np.ndarray = attr.ib(repr=False)  # sorted union of the verse keys of all sources
+    texts: Dict[str, np.ndarray] = attr.ib(repr=False)  # source => text of each key, None if missing
+    verse_counts: VerseCounts = attr.ib(repr=False)  # of all sources combined
+
+    @classmethod
+    def build(cls, bibles: Dict[str, "Bible"]) -> "Alignment":
+        columns = {}
+        verse_counts: VerseCounts = {}
+        for name, bible in bibles.items():
+            for book, chapters in bible.verse_counts.items():
+                for chapter, last_verse in chapters.items():
+                    counts = verse_counts.setdefault(book, {})
+                    counts[chapter] = max(counts.get(chapter, 0), last_verse)
+
+            df = bible.df
+            keys = verse_keys(df.index.get_level_values(0), df["chapter"].to_numpy(), df["verse"].to_numpy())
+            # the word for God is different between sources.
+            texts = df["text"].str.replace(bible.word_god, "神", regex=False).to_numpy(dtype=object)
+            order = np.argsort(keys, kind="stable")
+            columns[name] = (keys[order], texts[order])
+
+        union = np.unique(np.concatenate([keys for keys, _ in columns.values()]))
+        aligned = {}
+        for name, (keys, texts) in columns.items():
+            column = np.full(len(union), None, dtype=object)
+            column[np.searchsorted(union, keys)] = texts
+            aligned[name] = column
+
+        return cls(list(bibles), union, aligned, verse_counts)
+
+    def _verse(self, idx: int) -> VerseDiff:
+        texts = {name: self.texts[name][idx] for name in self.names}
+        return VerseDiff(*from_key(int(self.keys[idx])), _kind(texts), texts)
+
+    def diff(self) -> List[VerseDiff]:
+        "verses which are missing or merged in some source, or whose text differs ignoring punctuation"
+        columns = [self.texts[name] for name in self.names]
+        same = np.ones(len(self.keys), dtype=bool)
+        for column in columns[1:]:
+            same &= columns[0] == column
+        same &= ~np.equal(columns[0], None) & ~np.equal(columns[0], "")
+
+        verses = (self._verse(idx) for idx in np.flatnonzero(~same))
+        return [v for v in verses if v.kind]
+
+    def parallel(self, book_citations: BookCitations) -> List[VerseDiff]:
+        "texts of all sources of the citation"
+        book, cite_list = validate_citations(book_citations, self.verse_counts)
+
+        result = []
+        for cite in cite_list:
+            start, end = verse_key(book, cite.start), verse_key(book, cite.end)
+            for idx in range(np.searchsorted(self.keys, start), np.searchsorted(self.keys, end, side="right")):
+                result.append(self._verse(idx))
+
+        return result
+
+
+def load_sources(sources: List[str]) -> Dict[str, "Bible"]:
+    "{bible_source}:{bible_text} => Bible"
+    from bible.scripture import scripture
+
+    bibles = {}
+    for spec in sources:
+        source, filename = spec.split(":", 1)
+        bibles[spec] = scripture(filename, source)
+    return bibles
+
+
+def main(argv):
+    del argv
+
+    initialize_logging()
+    bibles = load_sources(FLAGS.bible_sources)
+    with span("Alignment.build"):
+        alignment = Alignment.build(bibles)
+
+    if FLAGS.bible_citations:
+        for cite_str, book_citations in parse_citations(FLAGS.bible_citations).items():
+            print(cite_str)
+            for v in alignment.parallel(book_citations):
+                print(f"{v.chapter:>3d}:{v.verse:<3d} {v.kind}")
+                for name, text in v.texts.items():
+                    print(f"    {name.split(':')[0]:<12} {text}")
+            print()
+        return
+
+    diffs = alignment.diff()
+    for v in diffs:
+        if v.kind != DIFFER:
+            texts = " | ".join(f"{name.split(':')[0]}={text}" for name, text in v.texts.items())
+            print(f"{v.book}{v.chapter}:{v.verse} {v.kind} {texts}")
+    counts = {kind: sum(v.kind == kind for v in diffs) for kind in (MISSING, MERGED, DIFFER)}
+    log.info(f"{len(alignment.keys)} verses of {len(alignment.names)} sources, {counts}")
+
+
+if __name__ == "__main__":
+    flags.DEFINE_string("bible_citations", "", "show parallel text of the citations instead of the differences")
+
+    app.run(main)
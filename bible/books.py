@@ -0,0 +1,200 @@
+"""Find bible citations in free text, e.g. a sermon outline or a bulletin.
+
+All names and abbreviations of book_index.csv are matched in one pass over the text with an Aho-Corasick automaton,
+a name is a hit only when it is followed by a citation like 3:16-18.
+"""
+
+import re
+import unicodedata
+from collections import deque
+from functools import lru_cache
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, NamedTuple, Optional, Tuple
+
+import romanize
+from bible.index import BookCitations, VerseLoc, parse_citations
+
+if TYPE_CHECKING:
+    import numpy as np
+
+BOOK_INDEX = (Path(__file__).parents[1] / "book_index.csv").as_posix()
+# other spellings of the names in book_index.csv, as in the services/*.flags.
+ALIASES = {"腓立比書": "腓利比書", "約翰一書": "約翰壹書", "約翰二書": "約翰貳書", "約翰三書": "約翰參書"}
+
+
+class Book(NamedTuple):
+    cname: str  # 約翰福音
+    cabbr: str  # 約
+    ename: str  # John
+    eabbr: str  # Jhn
+
+
+@lru_cache()
+def load_books(book_index: str = BOOK_INDEX) -> List[Book]:
+    "all 66 books in the order of the bible"
+    with open(book_index) as f:
+        next(f)  # header
+        return [Book(*(col.strip() for col in line.split("|"))) for line in f if line.strip()]
+
+
+@lru_cache()
+def _book_names(book_index: str = BOOK_INDEX) -> Dict[str, str]:
+    "names, abbreviations and pinyin/zhuyin keys => cname, an ambiguous key like yuehan is the first of the books"
+    books = load_books(book_index)
+    names = {key: cnames[0] for key, cnames in romanize.build_index((book.cname, book.cname) for book in books).items()}
+    for book in books:
+        for name in (book.cname, book.cabbr, book.ename, book.ename.replace(" ", ""), book.eabbr):
+            names[romanize.normalize_query(name)] = book.cname
+    names.update(ALIASES)
+    return names
+
+
+def canonical_book(name: str) -> str:
+    "詩篇, 詩, Psalms, psm, shipian, sp or ㄕㄆㄧㄢ => 詩篇, unknown names are kept as they are"
+    if name in _book_numbers():
+        return name
+    return _book_names().get(romanize.normalize_query(name), name)
+
+
+@lru_cache()
+def _book_numbers(book_index: str = BOOK_INDEX) -> Dict[str, int]:
+    return {book.cname: no for no, book in enumerate(load_books(book_index), 1)}
+
+
+def book_number(cname: str) -> int:
+    "1 for 創世記, 66 for 啟示錄"
+    return _book_numbers()[cname]
+
+
+# every verse of every source has the same key, book_number * 1000000 + chapter * 1000 + verse
+def verse_key(book: str, loc: VerseLoc) -> int:
+    return book_number(book) * 1_000_000 + loc.chapter * 1000 + loc.verse
+
+
+def verse_keys(books, chapters: "np.ndarray", verses: "np.ndarray") -> "np.ndarray":
+    "verse keys of arrays of (book, chapter, verse)"
+    import numpy as np
+
+    book_numbers = _book_numbers()
+    return np.array([book_numbers[book] for book in books], dtype=np.int64) * 1_000_000 + chapters * 1000 + verses
+
+
+def from_key(key: int) -> Tuple[str, int, int]:
+    "(book, chapter, verse) of a verse key"
+    return load_books()[key // 1_000_000 - 1].cname, key // 1000 % 1000, key % 1000
+
+
+class AhoCorasick:
+    "multi-pattern string matcher, patterns are matched case insensitively."
+
+    def __init__(self, patterns: Dict[str, object]):
+        # node => {char: node}, the root is node 0.
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        # node => (pattern length, value) of the longest pattern ending at the node, and the next node with output.
+        self.output: List[Optional[Tuple[int, object]]] = [None]
+        self.output_link: List[int] = [0]
+
+        for pattern, value in patterns.items():
+            node = 0
+            for ch in pattern.lower():
+                if ch not in self.goto[node]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append(None)
+                    self.output_link.append(0)
+                    self.goto[node][ch] = len(self.goto) - 1
+                node = self.goto[node][ch]
+            self.output[node] = (len(pattern), value)
+
+        # breadth first, fail of a node is the longest proper suffix which is also a prefix of some pattern.
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self.goto[node].items():
+                queue.append(child)
+                fail = self.fail[node]
+                while fail and ch not in self.goto[fail]:
+                    fail = self.fail[fail]
+                self.fail[child] = self.goto[fail].get(ch, 0)
+                suffix = self.fail[child]
+                self.output_link[child] = suffix if self.output[suffix] else self.output_link[suffix]
+
+    def finditer(self, text: str):
+        "(start, end, value) of all matches, ordered by end"
+        node = 0
+        for i, ch in enumerate(text):
+            ch = ch.lower()
+            while node and ch not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(ch, 0)
+
+            out = node if self.output[node] else self.output_link[node]
+            while out:
+                length, value = self.output[out]  # type: ignore
+                yield i + 1 - length, i + 1, value
+                out = self.output_link[out]
+
+
+_CHV = r"\d+\s*[:：]\s*\d+"
+_TO = r"\s*[-－～~_]\s*"
+# 3:16, 3:16-18, 3:16-4:2, or 3:16- to the end of the chapter, a dash apart from the verse is not a range
+_CITE = rf"{_CHV}(?:{_TO}(?:{_CHV}|\d+)|[-－～~](?!\s*\d))?"
+# 23, 23-24 or 23-24:3 of whole chapters
+_CHAPTERS = rf"\d+(?:{_TO}(?:{_CHV}|\d+))?"
+# 3:16-18,20,22-24 or 3:16,4:2
+_BOOK_CITES = rf"{_CITE}(?:\s*[,，、]\s*(?:{_CITE}|\d+(?:{_TO}\d+)?))*"
+_BOOK_CHAPTERS = rf"(?:{_CITE}|{_CHAPTERS})(?:\s*[,，、]\s*(?:{_CITE}|\d+(?:{_TO}\d+)?))*"
+# 6:12-13;10:23-24,31 continues with the same book after ;
+_CITES = re.compile(rf"\s*{_BOOK_CITES}(?:\s*[;；]\s*{_BOOK_CITES})*")
+# only a full name is a citation without a verse, 出3個 is not 出埃及記3.
+_CHAPTER_CITES = re.compile(rf"\s*{_BOOK_CHAPTERS}(?:\s*[;；]\s*{_BOOK_CHAPTERS})*")
+
+
+@lru_cache()
+def _matcher(book_index: str = BOOK_INDEX) -> AhoCorasick:
+    "name => (chinese name, whether it is a full name)"
+    names: Dict[str, Tuple[str, bool]] = {}
+    for book in load_books(book_index):
+        for name in (book.cabbr, book.eabbr):
+            names[name] = (book.cname, False)
+        for name in (book.cname, book.ename, book.ename.replace(" ", "")):
+            names[name] = (book.cname, True)
+    names.update((alias, (cname, True)) for alias, cname in ALIASES.items())
+    return AhoCorasick(names)
+
+
+def find_citations(text: str, book_index: str = BOOK_INDEX) -> List[Tuple[int, int, str]]:
+    "(start, end, citation) of citations in the text, with book names normalized, e.g. Jhn 3:16 => 約翰福音3:16"
+    # longest match of the leftmost start wins.
+    longest: Dict[int, Tuple[int, str, re.Pattern]] = {}
+    for start, end, (book, full) in _matcher(book_index).finditer(text):
+        # don't match Act in Exact 1:2.
+        if start and text[start - 1].isascii() and text[start - 1].isalnum() and text[start].isascii():
+            continue
+        cites = _CHAPTER_CITES if full else _CITES
+        if cites.match(text, end) and longest.get(start, (0, "", cites))[0] < end:
+            longest[start] = (end, book, cites)
+
+    result = []
+    pos = 0
+    for start in sorted(longest):
+        if start < pos:
+            continue
+        end, book, cites = longest[start]
+        m = cites.match(text, end)
+        assert m, "already checked"
+        pos = m.end()
+        # ２３：１－６ => 23:1-6
+        found = unicodedata.normalize("NFKC", re.sub(r"\s+", "", m.group()))
+        result.append((start, pos, book + found))
+
+    return result
+
+
+def extract_citations(text: str, book_index: str = BOOK_INDEX) -> Dict[str, BookCitations]:
+    "all citations in the text, parsed in bulk like parse_citations"
+    citations = [citation for _, _, citation in find_citations(text, book_index)]
+    if not citations:
+        return {}
+    return parse_citations(";".join(citations))
@@ -0,0 +1,175 @@
+"""Which parts of the bible were preached or read: a bitmap over the verses, one bit per verse.
+
+The verses of the bible are numbered 0..n-1 in the order of their verse keys (see bible.books.verse_key), a set of
+citations is a bitmap of n bits. Citations are OR-ed in as ranges of verse numbers with one cumulative sum, and the
+coverage of every book or chapter is one np.add.reduceat, so years of services are counted in milliseconds.
+"""
+
+from pathlib import Path
+from typing import Iterable, List, NamedTuple, Tuple
+
+import attr
+import numpy as np
+from absl import app, flags
+
+from base import initialize_logging, span
+from bible.books import from_key, verse_key
+from bible.index import BookCitations, parse_citations
+
+FLAGS = flags.FLAGS
+
+
+class Covered(NamedTuple):
+    book: str
+    chapter: int  # 0 for the whole book
+    covered: int  # verses
+    total: int
+
+
+@attr.s
+class VerseSpace:
+    keys: np.ndarray = attr.ib(repr=False)  # sorted verse keys of the bible, a verse is numbered by its position
+    chapter_starts: np.ndarray = attr.ib(init=False, repr=False)  # number of the first verse of each chapter
+    book_starts: np.ndarray = attr.ib(init=False, repr=False)  # index of the first chapter of each book
+
+    def __attrs_post_init__(self):
+        chapters = self.keys // 1000
+        self.chapter_starts = np.flatnonzero(np.diff(chapters, prepend=-1))
+        books = chapters[self.chapter_starts] // 1000
+        self.book_starts = np.flatnonzero(np.diff(books, prepend=-1))
+
+    @classmethod
+    def build(cls, keys: np.ndarray) -> "VerseSpace":
+        return cls(np.unique(np.asarray(keys, dtype=np.int64)))
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def ranges(self, key_ranges: Iterable[Tuple[int, int]]) -> Tuple[np.ndarray, np.ndarray]:
+        "verse key ranges => [start, end) of verse numbers, verses missing from the bible are skipped"
+        pairs = np.array(list(key_ranges), dtype=np.int64).reshape(-1, 2)
+        return np.searchsorted(self.keys, pairs[:, 0]), np.searchsorted(self.keys, pairs[:, 1], side="right")
+
+    def bitmap(self, key_ranges: Iterable[Tuple[int, int]]) -> np.ndarray:
+        "union of the verse key ranges"
+        starts, ends = self.ranges(key_ranges)
+        delta = np.zeros(len(self.keys) + 1, dtype=np.int32)
+        np.add.at(delta, starts, 1)
+        np.add.at(delta, ends, -1)
+        return np.cumsum(delta[:-1]) > 0
+
+
+def citation_ranges(book_citations: BookCitations) -> List[Tuple[int, int]]:
+    book, cite_list = book_citations
+    return [(verse_key(book, cite.start), verse_key(book, cite.end)) for cite in cite_list]
+
+
+@attr.s
+class Coverage:
+    space: VerseSpace = attr.ib(repr=False)
+    bits: np.ndarray = attr.ib(repr=False)  # bool of each verse
+
+    @classmethod
+    def empty(cls, space: VerseSpace) -> "Coverage":
+        return cls(space, np.zeros(len(space), dtype=bool))
+
+    @classmethod
+    def of(cls, space: VerseSpace, key_ranges: Iterable[Tuple[int, int]]) -> "Coverage":
+        return cls(space, space.bitmap(key_ranges))
+
+    @classmethod
+    def of_citations(cls, space: VerseSpace, citations: Iterable[str]) -> "Coverage":
+        "citations like 詩篇23;約翰福音3:16-18, e.g. the lines of a reading plan"
+        key_ranges = []
+        for citation in citations:
+            for book_citations in parse_citations(citation).values():
+                key_ranges.extend(citation_ranges(book_citations))
+        return cls.of(space, key_ranges)
+
+    def __or__(self, other: "Coverage") -> "Coverage":
+        return Coverage(self.space, self.bits | other.bits)
+
+    def __and__(self, other: "Coverage") -> "Coverage":
+        return Coverage(self.space, self.bits & other.bits)
+
+    def __sub__(self, other: "Coverage") -> "Coverage":
+        return Coverage(self.space, self.bits & ~other.bits)
+
+    def count(self) -> int:
+        return int(np.count_nonzero(self.bits))
+
+    def chapters(self) -> List[Covered]:
+        "coverage of every chapter"
+        starts = self.space.chapter_starts
+        covered = np.add.reduceat(self.bits.astype(np.int32), starts)
+        totals = np.diff(starts, append=len(self.bits))
+        result = []
+        for key, c, t in zip(self.space.keys[starts].tolist(), covered.tolist(), totals.tolist()):
+            book, chapter, _ = from_key(key)
+            result.append(Covered(book, chapter, c, t))
+        return result
+
+    def books(self) -> List[Covered]:
+        "coverage of every book"
+        starts = self.space.chapter_starts[self.space.book_starts]
+        covered = np.add.reduceat(self.bits.astype(np.int32), starts)
+        totals = np.diff(starts, append=len(self.bits))
+        return [
+            Covered(from_key(key)[0], 0, c, t)
+            for key, c, t in zip(self.space.keys[starts].tolist(), covered.tolist(), totals.tolist())
+        ]
+
+    def save(self, path: Path) -> None:
+        "the bits are packed, the whole bible is about 4KB"
+        np.savez_compressed(path, keys=self.space.keys, bits=np.packbits(self.bits))
+
+    @classmethod
+    def load(cls, path: Path) -> "Coverage":
+        with np.load(path) as f:
+            space = VerseSpace(f["keys"])
+            return cls(space, np.unpackbits(f["bits"], count=len(space)).astype(bool))
+
+
+def verse_space() -> VerseSpace:
+    "the verses of --bible_text"
+    from bible.shared import shared_scripture
+
+    return VerseSpace(np.array(shared_scripture().keys))
+
+
+def main(argv):
+    del argv
+    from mvccc.history import history
+
+    initialize_logging()
+    space = verse_space()
+
+    with span("coverage"):
+        services = [s for s in history().services if s.date >= FLAGS.coverage_since]
+        if FLAGS.coverage_until:
+            services = [s for s in services if s.date <= FLAGS.coverage_until]
+        preached = Coverage.of(space, [(start, end) for s in services for _, start, end in s.citations])
+    print(f"{len(services)} services, {preached.count()} of {len(space)} verses")
+
+    if FLAGS.coverage_plan:
+        lines = [line for line in Path(FLAGS.coverage_plan).read_text().splitlines() if line.strip()]
+        plan = Coverage.of_citations(space, lines)
+        print(f"reading plan: {plan.count()} verses, {(plan - preached).count()} not preached")
+        preached = preached | plan
+
+    chapters = preached.chapters() if FLAGS.coverage_chapters else []
+    for covered in preached.books():
+        if covered.covered:
+            print(f"{covered.book:<8} {covered.covered:>5d}/{covered.total:<5d} {covered.covered / covered.total:6.1%}")
+            for chapter in chapters:
+                if chapter.book == covered.book and chapter.covered:
+                    print(f"    {chapter.chapter:>3d} {chapter.covered:>3d}/{chapter.total:<3d}")
+
+
+if __name__ == "__main__":
+    flags.DEFINE_string("coverage_since", "", "count the services since the date, e.g. 2019-01-01")
+    flags.DEFINE_string("coverage_until", "", "count the services until the date")
+    flags.DEFINE_string("coverage_plan", "", "a reading plan, one citation per line, to add to the services")
+    flags.DEFINE_bool("coverage_chapters", False, "show the coverage of every chapter")
+
+    app.run(main)
@@ -0,0 +1,140 @@
+"""Character n-gram inverted index for "which verse says ..." searches.
+
+The index is built once from a loaded Bible and cached next to its csv cache as {bible_text}.fulltext.pkl.
+"""
+
+import math
+import pickle
+import re
+from array import array
+from collections import defaultdict
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+import attr
+from absl import flags, logging as log
+
+from base import span, timed
+from bible.index import BibleVerse
+
+if TYPE_CHECKING:
+    from bible.scripture import Bible
+
+FLAGS = flags.FLAGS
+
+NGRAM = 2
+VERSION = 1
+
+# both　神 and 上帝 are indexed and searched as 神.
+WORD_GOD_VARIANTS = ("　神", "上帝")
+_NON_WORD = re.compile(r"[\W_]+")
+
+
+def normalize(text: str) -> str:
+    for variant in WORD_GOD_VARIANTS:
+        text = text.replace(variant, "神")
+    return _NON_WORD.sub("", text)
+
+
+def ngrams(text: str, n: int = NGRAM) -> List[str]:
+    return [text[i:i + n] for i in range(len(text) - n + 1)]
+
+
+@attr.s
+class FullTextIndex:
+    bible: "Bible" = attr.ib(repr=False)
+    postings: Dict[str, array] = attr.ib(repr=False)  # ngram => sorted row numbers of bible.df
+    texts: List[str] = attr.ib(repr=False)  # normalized text of each row
+
+    @classmethod
+    def build(cls, bible: "Bible") -> "FullTextIndex":
+        texts = [normalize(text) for text in bible.df["text"]]
+        postings: Dict[str, array] = defaultdict(lambda: array("i"))
+        for row, text in enumerate(texts):
+            for gram in set(ngrams(text)):
+                postings[gram].append(row)
+
+        return cls(bible, dict(postings), texts)
+
+    def candidates(self, term: str) -> Optional[array]:
+        "rows which contain all ngrams of the term, None if term is too short to use the index"
+        grams = sorted(set(ngrams(term)), key=lambda gram: len(self.postings.get(gram, ())))
+        if not grams:
+            return None
+        rows = set(self.postings.get(grams[0], ()))
+        for gram in grams[1:]:
+            if not rows:
+                break
+            rows.intersection_update(self.postings.get(gram, ()))
+        return array("i", sorted(rows))
+
+    @timed("FullTextIndex.search")
+    def search(self, query: str, limit: int = 20, word_god: str = None) -> List[Tuple[float, BibleVerse]]:
+        """Verses matching all terms of the query, ranked by score.
+
+        Terms are separated by whitespace, each term is a phrase matched within a verse ignoring punctuation.
+        Terms found more often, rarer terms and shorter verses score higher.
+        """
+        if word_god is None:
+            word_god = FLAGS.bible_word_god
+
+        terms = [normalize(term) for term in query.split()]
+        terms = [term for term in terms if term]
+        if not terms:
+            return []
+
+        matched: Optional[set] = None
+        term_rows: Dict[str, List[int]] = {}
+        for term in terms:
+            rows = self.candidates(term)
+            if rows is None:  # single character
+                rows = range(len(self.texts)) if matched is None else sorted(matched)
+            term_rows[term] = [row for row in rows if term in self.texts[row]]
+            matched = set(term_rows[term]) if matched is None else matched.intersection(term_rows[term])
+            if not matched:
+                return []
+
+        total = len(self.texts)
+        scored = []
+        for row in matched:
+            text = self.texts[row]
+            score = sum(
+                text.count(term) * math.log(1 + total / len(term_rows[term])) * len(term) for term in terms
+            ) / math.sqrt(len(text))
+            scored.append((score, row))
+        scored.sort(key=lambda t: (-t[0], t[1]))
+
+        result = []
+        df = self.bible.df
+        for score, row in scored[:limit]:
+            book, _ = df.index[row]
+            chapter, verse, text = df.iloc[row][["chapter", "verse", "text"]]
+            if self.bible.word_god != word_god:
+                text = text.replace(self.bible.word_god, word_god)
+            result.append((score, BibleVerse(book, int(chapter), int(verse), text)))
+
+        return result
+
+
+def _cache_path(filename: str) -> Path:
+    return Path(f"{filename}.fulltext.pkl")
+
+
+def load_or_build(bible: "Bible", filename: str) -> FullTextIndex:
+    "load the index cached next to the bible, build and cache it if missing or stale."
+    path = _cache_path(filename)
+    csv = Path(f"{filename}.csv")
+    if path.exists() and (not csv.exists() or path.stat().st_mtime >= csv.stat().st_mtime):
+        with span("FullTextIndex.load"), path.open("rb") as f:
+            version, rows, postings = pickle.load(f)
+        if version == VERSION and rows == len(bible.df):
+            return FullTextIndex(bible, postings, [normalize(text) for text in bible.df["text"]])
+        log.warning(f"{path} is out of date, rebuild it.")
+
+    with span("FullTextIndex.build"):
+        index = FullTextIndex.build(bible)
+    with path.open("wb") as out:
+        pickle.dump((VERSION, len(bible.df), index.postings), out, protocol=pickle.HIGHEST_PROTOCOL)
+    log.info(f"write fulltext index to {path}")
+
+    return index
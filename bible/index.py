@@ -2,6 +2,12 @@ import re
 from collections import OrderedDict
 from typing import Dict, List, NamedTuple
 
+# end verse of a whole chapter or an open range like 3:10-, resolved with the verse counts of the bible.
+LAST_VERSE = 999
+
+# book => chapter => number of the last verse of the chapter
+VerseCounts = Dict[str, Dict[int, int]]
+
 
 # defined for search
 class VerseLoc(NamedTuple):
@@ -21,8 +27,16 @@ class BookCitations(NamedTuple):
     citations: List[Citation]
 
 
+class BibleVerse(NamedTuple):
+    book: str
+    chapter: int
+    verse: int
+    text: str
+
+
 def parse_citations(citations: str) -> Dict[str, BookCitations]:
     "parse citations to Dict[citation, List[BookCitation]]"
+    from bible.books import canonical_book  # bible.books imports this module.
 
     result: Dict[str, BookCitations] = OrderedDict()
 
@@ -30,6 +44,7 @@ def parse_citations(citations: str) -> Dict[str, BookCitations]:
     for book_cites in book_cites_list:
         book_cites = (
             book_cites.replace("～", "-")
+            .replace("~", "-")
             .replace("－", "-")
             .replace("_", "-")
             .replace("，", ",")
@@ -42,8 +57,9 @@ def parse_citations(citations: str) -> Dict[str, BookCitations]:
         # 1. book
         m = re.search(r"^(?P<book>[^0-9 ]+)\s*", book_cites)
         if m:
-            book = m.group("book")
-            cites_start = len(book)
+            cites_start = len(m.group("book"))
+            # shipian, Psm or 詩 => 詩篇
+            book = canonical_book(m.group("book"))
             cites = book_cites[cites_start:]
         else:
             cites = book_cites
@@ -53,12 +69,19 @@ def parse_citations(citations: str) -> Dict[str, BookCitations]:
         # 11:12-15,19 => Citation((11,12), (11,15)), Citation((11,19),(11,19))
         # 11:12-13:15,19 => Citation((11,12), (13,15)), Citation((13,19),(13,19))
         # 23:10-11,15-17 => Citation((23,10), (23,11)), Citation((23,15),(23,17))
+        # 23,24 => Citation((23,1), (23,LAST_VERSE)), Citation((24,1),(24,LAST_VERSE))
+        # 23-24:3 => Citation((23,1), (24,3))
+        # 23:3- => Citation((23,3), (23,LAST_VERSE))
         prev_chapter = -1
         cite_list: List[Citation] = []
         for cite in cites.split(","):
             parts = cite.split("-")
             if len(parts) == 1:  # single verse.
                 chv = parts[0].split(":")
+                if len(chv) == 1 and prev_chapter == -1:  # whole chapter
+                    chapter = int(chv[0])
+                    cite_list.append(Citation(VerseLoc(chapter, 1), VerseLoc(chapter, LAST_VERSE)))
+                    continue
                 if len(chv) == 1:  # inherit the chapter
                     verse = int(chv[0])
                     chapter = prev_chapter
@@ -69,22 +92,55 @@ def parse_citations(citations: str) -> Dict[str, BookCitations]:
             else:
                 start, end = parts
                 start_parts = list(map(int, start.split(":")))
-                if len(start_parts) == 1:
-                    start_chapter = prev_chapter
+                whole_chapters = len(start_parts) == 1 and prev_chapter == -1
+                if whole_chapters:
+                    start_chapter, start_verse = start_parts[0], 1
+                elif len(start_parts) == 1:
+                    start_chapter, start_verse = prev_chapter, start_parts[0]
                 else:
-                    start_chapter = start_parts[0]
-                start_verse = start_parts[-1]
-
-                end_parts = list(map(int, end.split(":")))
-                if len(end_parts) == 1:
-                    end_chapter = start_chapter
+                    start_chapter, start_verse = start_parts
+
+                end_parts = list(map(int, end.split(":"))) if end else []
+                if not end_parts:  # open range
+                    end_chapter, end_verse = start_chapter, LAST_VERSE
+                elif len(end_parts) == 2:
+                    end_chapter, end_verse = end_parts
+                elif whole_chapters:
+                    end_chapter, end_verse = end_parts[0], LAST_VERSE
                 else:
-                    end_chapter = end_parts[0]
+                    end_chapter, end_verse = start_chapter, end_parts[0]
                 prev_chapter = end_chapter
-                end_verse = int(end_parts[-1])
 
                 cite_list.append(Citation(VerseLoc(start_chapter, start_verse), VerseLoc(end_chapter, end_verse)))
 
         result[book_cites] = BookCitations(book, cite_list)
 
     return result
+
+
+def validate_citations(book_citations: BookCitations, verse_counts: VerseCounts) -> BookCitations:
+    "replace LAST_VERSE with the number of the last verse of the chapter, raise ValueError if a verse doesn't exist"
+
+    book, cite_list = book_citations
+    chapters = verse_counts.get(book)
+    if chapters is None:
+        raise ValueError(f"unknown book {book}.")
+
+    def check(loc: VerseLoc) -> VerseLoc:
+        last_verse = chapters.get(loc.chapter)
+        if last_verse is None:
+            raise ValueError(f"{book} has no chapter {loc.chapter}.")
+        if loc.verse == LAST_VERSE:
+            return VerseLoc(loc.chapter, last_verse)
+        if not 1 <= loc.verse <= last_verse:
+            raise ValueError(f"{book}{loc.chapter} has no verse {loc.verse}, it ends at {last_verse}.")
+        return loc
+
+    result = []
+    for cite in cite_list:
+        start, end = check(cite.start), check(cite.end)
+        if start > end:
+            raise ValueError(f"{book}{start.chapter}:{start.verse} is after {end.chapter}:{end.verse}.")
+        result.append(Citation(start, end))
+
+    return BookCitations(book, result)
@@ -1,19 +1,23 @@
 #!/usr/bin/env python3
 
 import re
+import threading
 import warnings
 from collections import OrderedDict, defaultdict
-from functools import lru_cache
 from pathlib import Path
-from typing import IO, Dict, Generator, List, NamedTuple, Tuple
+from typing import IO, TYPE_CHECKING, Dict, Generator, List, Tuple
 from zipfile import ZipFile
 
 import attr
-import pandas as pd
 from absl import app, flags, logging as log
-from bs4 import BeautifulSoup
 
-from bible.index import BookCitations, VerseLoc, parse_citations
+import metrics
+from base import span, timed
+from bible.index import BibleVerse, BookCitations, VerseCounts, VerseLoc, parse_citations, validate_citations
+
+if TYPE_CHECKING:
+    # pandas, bs4 and lxml are slow to import, they are imported only when the bible is loaded.
+    import pandas as pd
 
 FLAGS = flags.FLAGS
 
@@ -21,20 +25,23 @@ FLAGS = flags.FLAGS
 flags.DEFINE_string("bible_text", "download/CMNUNV.epub", "see Makefile for source of download")
 flags.DEFINE_string("bible_source", "bible.cloud", "[ibibles.net, bible.cloud]")
 flags.DEFINE_string("bible_word_god", "\u3000神", "\u3000神 or 上帝")
-
-
-class BibleVerse(NamedTuple):
-    book: str
-    chapter: int
-    verse: int
-    text: str
+flags.DEFINE_integer("bible_limit", 20, "max number of verses of --bible_query")
+flags.DEFINE_bool("bible_shared", True, "look up verses from the bible memory-mapped by all local processes")
 
 
 @attr.s
 class Bible:
     word_god: str = attr.ib()
-    df: pd.DataFrame = attr.ib()
+    df: "pd.DataFrame" = attr.ib()
+    verse_counts: VerseCounts = attr.ib(init=False, repr=False)
 
+    def __attrs_post_init__(self):
+        verse_counts: VerseCounts = defaultdict(dict)
+        for (book, chapter), last_verse in self.df.groupby(["book", "chapter"])["verse"].max().items():
+            verse_counts[book][int(chapter)] = int(last_verse)
+        self.verse_counts = dict(verse_counts)
+
+    @timed("Bible.search")
     def search(
         self, book_citation_list: List[Tuple[str, BookCitations]], word_god: str = None
     ) -> Dict[str, List[BibleVerse]]:
@@ -44,13 +51,20 @@ class Bible:
         def to_index(t: VerseLoc) -> int:
             return t.chapter * 1000 + t.verse
 
+        # reject invalid citations before any lookup.
+        book_citation_list = [
+            (cite_str, validate_citations(book_citations, self.verse_counts))
+            for cite_str, book_citations in book_citation_list
+        ]
+
         result: Dict[str, List[BibleVerse]] = OrderedDict()
         for cite_str, book_citations in book_citation_list:
             book, cite_list = book_citations
             verses = []
             for cite in cite_list:
-                df = self.df.loc[(book,), :]
-                df = df[(df.index >= to_index(cite.start)) & (df.index <= to_index(cite.end))]
+                # binary search on the sorted (book, chv) index.
+                start, end = (book, to_index(cite.start)), (book, to_index(cite.end))
+                df = self.df.loc[start:end]
                 for t in df.itertuples():
                     text = t.text.replace(self.word_god, word_god) if self.word_god != word_god else t.text
                     verses.append(BibleVerse(book, t.chapter, t.verse, text))
@@ -60,12 +74,14 @@ class Bible:
         return result
 
 
-def _postprocess_cleanup(df: pd.DataFrame) -> pd.DataFrame:
+def _postprocess_cleanup(df: "pd.DataFrame") -> "pd.DataFrame":
     df["chv"] = df["chapter"] * 1000 + df["verse"]
     return df.set_index(["book", "chv"]).sort_index().dropna()
 
 
 def from_ibibles_net(filename: str) -> Bible:
+    import pandas as pd
+
     # XXX: problem with this source is the puctuation is not contemporary.
     def to_record(f: IO[str]) -> Generator[BibleVerse, None, None]:
         for line in f:
@@ -85,7 +101,8 @@ def from_ibibles_net(filename: str) -> Bible:
 
     cache = Path(filename + ".csv")
     if cache.exists():
-        df = pd.read_csv(cache, sep="\t")
+        # the empty text of a merged verse is kept as "", not NaN which is dropped.
+        df = pd.read_csv(cache, sep="\t", keep_default_na=False)
 
     else:
         # https://stackoverflow.com/questions/17912307/u-ufeff-in-python-string
@@ -103,12 +120,15 @@ def from_ibibles_net(filename: str) -> Bible:
 
 
 def from_bible_cloud(filename: str) -> Bible:
+    import pandas as pd
+    from bs4 import BeautifulSoup
+
     def to_record(zf: ZipFile) -> Generator[BibleVerse, None, None]:
         index = zf.read("OEBPS/index.xhtml").decode("utf-8-sig")
         root = BeautifulSoup(index, features="lxml")
         for a in root.select("a.oo") + root.select("a.nn"):
             book = a.text
-            log.info(f"processing {book}")
+            log.info("processing %s", book)
             book_text = zf.read(f"OEBPS/{a['href']}").decode("utf-8-sig")
             book_root = BeautifulSoup(book_text, features="lxml")
 
@@ -192,7 +212,8 @@ def from_bible_cloud(filename: str) -> Bible:
 
     cache = Path(filename + ".csv")
     if cache.exists():
-        df = pd.read_csv(cache, sep="\t")
+        # the empty text of a merged verse is kept as "", not NaN which is dropped.
+        df = pd.read_csv(cache, sep="\t", keep_default_na=False)
     else:
         with ZipFile(filename) as zf:
             df = pd.DataFrame.from_records(to_record(zf), columns=["book", "chapter", "verse", "text"])
@@ -205,21 +226,44 @@ def from_bible_cloud(filename: str) -> Bible:
     return Bible("上帝", df)
 
 
-@lru_cache()
+_scripture_lock = threading.Lock()
+
+
 def scripture(filename=None, source=None) -> Bible:
     if filename is None:
         filename = FLAGS.bible_text
     if source is None:
         source = FLAGS.bible_source
 
+    # concurrent callers wait for the first one to load the bible instead of loading it again.
+    with span("scripture"), _scripture_lock:
+        return _load_scripture(filename, source)
+
+
+@metrics.count_cache("scripture")
+def _load_scripture(filename: str, source: str) -> Bible:
     return {"ibibles.net": from_ibibles_net, "bible.cloud": from_bible_cloud}[source](filename)
 
 
 if __name__ == "__main__":
+    from bible.books import extract_citations
+    from bible.fulltext import load_or_build
+
     flags.DEFINE_string("bible_citations", "約翰福音3:16;14:6", "bible search by location")
+    flags.DEFINE_string("bible_query", "", "bible search by text, e.g. 神愛世人 or '愛 恆久忍耐'")
+    flags.DEFINE_string("bible_outline", "", "search all citations found in this file, e.g. a sermon outline")
 
     def main(_):
-        book_citation_list = list(parse_citations(FLAGS.bible_citations).items())
+        if FLAGS.bible_query:
+            index = load_or_build(scripture(), FLAGS.bible_text)
+            for score, v in index.search(FLAGS.bible_query, limit=FLAGS.bible_limit):
+                print(f"{v.book}{v.chapter}:{v.verse} ({score:.2f}) {v.text}")
+            return
+
+        if FLAGS.bible_outline:
+            book_citation_list = list(extract_citations(Path(FLAGS.bible_outline).read_text()).items())
+        else:
+            book_citation_list = list(parse_citations(FLAGS.bible_citations).items())
         bible = scripture()
         result = bible.search(book_citation_list)
         for loc, verses in result.items():
@@ -0,0 +1,158 @@
+"""Read-only bible shared by all local processes through a memory-mapped file.
+
+scripture() keeps a DataFrame per process. The shared store is written once next to the csv cache as
+{bible_text}.mmap, every streamlit server, notebook kernel or worker process maps the same file, the pages are
+shared through the page cache and attaching does not parse anything.
+
+File layout, all integers are little endian int64:
+    MAGIC | header length | json header {word_god, count, text_bytes} padded to 8 bytes
+    | verse keys[count] | text offsets[count + 1] | utf-8 text[text_bytes]
+"""
+
+import json
+import mmap
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import attr
+import numpy as np
+from absl import flags, logging as log
+
+import metrics
+from base import span, timed
+from bible.books import from_key, verse_key, verse_keys
+from bible.index import BibleVerse, BookCitations, VerseCounts, validate_citations
+from bible.scripture import Bible, scripture
+
+FLAGS = flags.FLAGS
+
+MAGIC = b"BIBLEMM1"
+INT64 = np.dtype("<i8")
+
+
+def _padded(n: int) -> int:
+    return (n + 7) // 8 * 8
+
+
+def write_shared(bible: Bible, path: Path) -> None:
+    "write the bible to path atomically, so concurrent writers and readers never see a partial file"
+    df = bible.df
+    keys = verse_keys(df.index.get_level_values(0), df["chapter"].to_numpy(), df["verse"].to_numpy()).astype(INT64)
+    order = np.argsort(keys, kind="stable")
+    texts = [text.encode("utf-8") for text in df["text"].to_numpy()[order]]
+    offsets = np.zeros(len(texts) + 1, dtype=INT64)
+    np.cumsum([len(text) for text in texts], out=offsets[1:])
+
+    header = json.dumps({"word_god": bible.word_god, "count": len(texts), "text_bytes": int(offsets[-1])}).encode()
+    header += b" " * (_padded(len(header)) - len(header))
+
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with tmp.open("wb") as out:
+        out.write(MAGIC)
+        out.write(np.array([len(header)], dtype=INT64).tobytes())
+        out.write(header)
+        out.write(keys[order].tobytes())
+        out.write(offsets.tobytes())
+        out.write(b"".join(texts))
+    os.replace(tmp, path)
+
+
+@attr.s
+class SharedBible:
+    "Bible.search over a memory-mapped file, nothing is copied until the text of a verse is read."
+
+    word_god: str = attr.ib()
+    keys: np.ndarray = attr.ib(repr=False)  # sorted verse keys
+    offsets: np.ndarray = attr.ib(repr=False)  # text of keys[i] is buf[offsets[i]:offsets[i + 1]]
+    buf: mmap.mmap = attr.ib(repr=False)
+    text_start: int = attr.ib(repr=False)
+    verse_counts: VerseCounts = attr.ib(init=False, repr=False)
+
+    def __attrs_post_init__(self):
+        # the last verse of each chapter is where book_number * 1000 + chapter changes.
+        chapters = self.keys // 1000
+        ends = np.flatnonzero(np.diff(chapters, append=-1))
+        verse_counts: VerseCounts = {}
+        for key in self.keys[ends].tolist():
+            book, chapter, verse = from_key(key)
+            verse_counts.setdefault(book, {})[chapter] = verse
+        self.verse_counts = verse_counts
+
+    @classmethod
+    def attach(cls, path: Path) -> "SharedBible":
+        with path.open("rb") as f:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        assert buf[: len(MAGIC)] == MAGIC, f"{path} is not a shared bible."
+        header_len = int(np.frombuffer(buf, dtype=INT64, count=1, offset=len(MAGIC))[0])
+        start = len(MAGIC) + INT64.itemsize
+        header = json.loads(buf[start:start + header_len])
+        count = header["count"]
+
+        start += header_len
+        keys = np.frombuffer(buf, dtype=INT64, count=count, offset=start)
+        start += count * INT64.itemsize
+        offsets = np.frombuffer(buf, dtype=INT64, count=count + 1, offset=start)
+        start += (count + 1) * INT64.itemsize
+
+        return cls(header["word_god"], keys, offsets, buf, start)
+
+    def text(self, idx: int) -> str:
+        start, end = self.offsets[idx:idx + 2] + self.text_start
+        return self.buf[start:end].decode("utf-8")
+
+    @timed("SharedBible.search")
+    def search(
+        self, book_citation_list: List[Tuple[str, BookCitations]], word_god: str = None
+    ) -> Dict[str, List[BibleVerse]]:
+        if word_god is None:
+            word_god = FLAGS.bible_word_god
+
+        book_citation_list = [
+            (cite_str, validate_citations(book_citations, self.verse_counts))
+            for cite_str, book_citations in book_citation_list
+        ]
+
+        result: Dict[str, List[BibleVerse]] = OrderedDict()
+        for cite_str, (book, cite_list) in book_citation_list:
+            verses = []
+            for cite in cite_list:
+                start, end = verse_key(book, cite.start), verse_key(book, cite.end)
+                for idx in range(np.searchsorted(self.keys, start), np.searchsorted(self.keys, end, side="right")):
+                    _, chapter, verse = from_key(int(self.keys[idx]))
+                    text = self.text(idx)
+                    if self.word_god != word_god:
+                        text = text.replace(self.word_god, word_god)
+                    verses.append(BibleVerse(book, chapter, verse, text))
+
+            result[cite_str] = verses
+
+        return result
+
+
+_shared_lock = threading.Lock()
+
+
+def shared_scripture(filename=None, source=None) -> SharedBible:
+    "attach to {filename}.mmap, write it first from scripture() if it is missing or older than the csv cache."
+    if filename is None:
+        filename = FLAGS.bible_text
+    if source is None:
+        source = FLAGS.bible_source
+
+    with span("shared_scripture"), _shared_lock:
+        return _attach(filename, source)
+
+
+@metrics.count_cache("shared_scripture")
+def _attach(filename: str, source: str) -> SharedBible:
+    path = Path(f"{filename}.mmap")
+    csv = Path(f"{filename}.csv")
+    if not path.exists() or (csv.exists() and path.stat().st_mtime < csv.stat().st_mtime):
+        with span("write_shared"):
+            write_shared(scripture(filename, source), path)
+        log.info(f"write shared bible to {path}")
+
+    return SharedBible.attach(path)
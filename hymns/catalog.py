@@ -0,0 +1,243 @@
+"""Crosswalk of the hymns of all sources, so 教會聖詩 #236 is one lookup to its score, lyrics and decks.
+
+The sources number hymns differently: zanmei scores are {no:03d}_{name}.png with 493-495 folded into 492,
+hoctoga/hoc5 lyrics are {idx:03d}_{title}.txt, and mvccc decks are 236_, 1001_, B94_ or only a title, and 488-1_
+is an addition of mvccc after #488, not #488. Every file with a 教會聖詩 number joins the record of that number.
+The others join a record by their normalized title, or by the lyrics fingerprint of hymns.dedup, e.g.
+mvccc/愛的真諦 => 5087_愛的真締, and otherwise become a record of their own. The records are written to
+processed/catalog.json, which is built again when a source changes.
+"""
+
+import json
+import os
+import re
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import attr
+from absl import app, logging as log
+
+from base import initialize_logging
+from hymns import TOTAL
+from hymns.dedup import FINGERPRINTS, fingerprints
+from hymns.fuzzy import normalize
+
+DOWNLOAD = Path("download")
+PROCESSED = Path("processed")
+CATALOG = "catalog.json"
+
+# the order of the columns, zanmei only has score images.
+SOURCES = ["zanmei", "hoctoga", "hoc5", "mvccc", "mvccc_choir"]
+SUFFIXES = (".png", ".txt", ".pptx")
+# zanmei has the score of 493-495 in 492.
+FOLDED = {493: 492, 494: 492, 495: 492}
+
+# 236_, 488-1_, B94_, E001_, or 2019-10-27- of choir decks.
+_NAME = re.compile(r"(?:(?P<id>[A-Z]?\d+[A-Z]?(?:-\d+)?)_|\d{4}-\d{2}-\d{2}-)?(?P<title>.+)")
+_HYMNAL_ID = re.compile(r"\d{3}")
+
+
+class SourceFile(NamedTuple):
+    source: str
+    id: str  # number of the hymn in the source, empty if it has none
+    title: str
+    path: str
+
+
+def hymnal_no(id: str) -> Optional[int]:
+    "教會聖詩 number of a source id, None for other hymnals, e.g. 1001 or B94, and the 488-1 additions of mvccc"
+    if _HYMNAL_ID.fullmatch(id) and 1 <= int(id) <= TOTAL:
+        return int(id)
+    return None
+
+
+def scan(basepath: Path, source: str) -> Iterable[SourceFile]:
+    "files of a source directory, the .raw.txt and .errata.txt of a hymn are one file"
+    seen = set()
+    with os.scandir(basepath) as entries:
+        names = sorted(entry.name for entry in entries if entry.name.endswith(SUFFIXES))
+    for name in names:
+        m = _NAME.fullmatch(name.split(".", 1)[0])
+        file = SourceFile(source, m.group("id") or "", m.group("title"), (basepath / name).as_posix())
+        if name.endswith(".txt"):
+            if (file.id, file.title) in seen:
+                continue
+            seen.add((file.id, file.title))
+        yield file
+
+
+@attr.s
+class Record:
+    key: str = attr.ib()  # the 教會聖詩 number, or the normalized title of hymns from other hymnals
+    no: Optional[int] = attr.ib()  # 教會聖詩 number
+    title: str = attr.ib()
+    files: Dict[str, List[SourceFile]] = attr.ib(factory=dict, repr=False)  # source => files
+
+    def add(self, file: SourceFile) -> None:
+        files = self.files.setdefault(file.source, [])
+        if file not in files:
+            files.append(file)
+
+    def to_json(self) -> Dict:
+        sources = {source: [[f.id, f.title, f.path] for f in files] for source, files in self.files.items()}
+        return {"key": self.key, "no": self.no, "title": self.title, "sources": sources}
+
+    @classmethod
+    def from_json(cls, d: Dict) -> "Record":
+        files = {source: [SourceFile(source, *f) for f in files] for source, files in d["sources"].items()}
+        return cls(d["key"], d["no"], d["title"], files)
+
+
+@attr.s
+class Catalog:
+    records: List[Record] = attr.ib(repr=False)
+    by_key: Dict[str, Record] = attr.ib(init=False, repr=False)
+    by_title: Dict[str, List[Record]] = attr.ib(init=False, repr=False)  # normalized title of every file
+    by_id: Dict[Tuple[str, str], Record] = attr.ib(init=False, repr=False)  # (source, id) => record
+
+    def __attrs_post_init__(self):
+        self.by_key, self.by_title, self.by_id = {}, {}, {}
+        for record in self.records:
+            self.by_key[record.key] = record
+            for files in record.files.values():
+                for file in files:
+                    titled = self.by_title.setdefault(normalize(file.title), [])
+                    if record not in titled:
+                        titled.append(record)
+                    if file.id:
+                        self.by_id.setdefault((file.source, file.id), record)
+
+    @classmethod
+    def build(cls, files: Iterable[SourceFile], fingerprints: Dict[str, str] = None) -> "Catalog":
+        "fingerprints: path => path of the canonical version of the same lyrics, see hymns.dedup.fingerprints"
+        if fingerprints is None:
+            fingerprints = {}
+
+        records: Dict[str, Record] = {}
+        by_title: Dict[str, List[Record]] = {}
+        # the canonical path of the lyrics of a file => its record, so any file of a cluster joins the others.
+        by_lyrics: Dict[str, Record] = {}
+
+        def add(record: Record, file: SourceFile) -> None:
+            record.add(file)
+            by_lyrics.setdefault(fingerprints.get(file.path, file.path), record)
+            titled = by_title.setdefault(normalize(file.title), [])
+            if record not in titled:
+                titled.append(record)
+
+        others = []
+        for file in files:
+            no = hymnal_no(file.id)
+            if no is None:
+                others.append(file)
+                continue
+            add(records.setdefault(str(no), Record(str(no), no, file.title)), file)
+
+        for folded, into in FOLDED.items():
+            for file in records[str(into)].files.get("zanmei", []) if str(into) in records else []:
+                records.setdefault(str(folded), Record(str(folded), folded, file.title)).add(file)
+
+        for file in others:
+            titled = by_title.get(normalize(file.title), [])
+            record = titled[0] if len(titled) == 1 else by_lyrics.get(fingerprints.get(file.path, file.path))
+            if record is None:
+                key = normalize(file.title) or file.title
+                record = records.setdefault(key, Record(key, None, file.title))
+            add(record, file)
+
+        return cls(sorted(records.values(), key=lambda r: (r.no is None, r.no or 0, r.key)))
+
+    def lookup(self, query: str) -> List[Record]:
+        "236, #236, the id of a source as mvccc:B94, or a title"
+        query = query.strip().lstrip("#")
+        if ":" in query:
+            record = self.by_id.get(tuple(query.split(":", 1)))
+            return [record] if record else []
+        no = hymnal_no(query.zfill(3)) if query.isdigit() else hymnal_no(query)
+        if no is not None:
+            return [self.by_key[str(no)]] if str(no) in self.by_key else []
+        return list(self.by_title.get(normalize(query), []))
+
+    def resolve(self, keyword: str) -> Optional[Record]:
+        "the record of a hymn keyword of search_hymn_ppt, e.g. 001_齊來稱頌偉大之神, 獻上感恩的心 or a part of a title"
+        m = _NAME.fullmatch(keyword.replace(".pptx", ""))
+        id, title = (m.group("id") or "", m.group("title")) if m else ("", keyword)
+        no = hymnal_no(id)
+        if no is not None and str(no) in self.by_key:
+            return self.by_key[str(no)]
+        # the other ids of the decks, e.g. 488-1 or B94.
+        if ("mvccc", id) in self.by_id:
+            return self.by_id[("mvccc", id)]
+
+        title = normalize(title)
+        if title in self.by_title:
+            return self.by_title[title][0]
+        for other, records in self.by_title.items():
+            if title and title in other:
+                return records[0]
+        return None
+
+    def save(self, path: Path) -> None:
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with tmp.open("w") as out:
+            json.dump([record.to_json() for record in self.records], out, ensure_ascii=False, indent=1)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path) -> "Catalog":
+        with path.open() as f:
+            return cls([Record.from_json(d) for d in json.load(f)])
+
+
+def build_catalog(download: Path = DOWNLOAD, processed: Path = PROCESSED) -> Catalog:
+    files: List[SourceFile] = []
+    for source in SOURCES:
+        # only the scores of zanmei are kept in download/, the others are processed.
+        basepath = (download if source == "zanmei" else processed) / source
+        if basepath.is_dir():
+            files.extend(scan(basepath, source))
+
+    found = fingerprints(processed)
+    return Catalog.build(files, {(processed / k).as_posix(): (processed / v).as_posix() for k, v in found.items()})
+
+
+def sources_mtime(download: Path = DOWNLOAD, processed: Path = PROCESSED) -> float:
+    "the latest mtime of the source directories, i.e. a file is added, removed or renamed, and of the fingerprints"
+    paths = [(download if source == "zanmei" else processed) / source for source in SOURCES]
+    return max((path.stat().st_mtime for path in paths + [processed / FINGERPRINTS] if path.exists()), default=0)
+
+
+def catalog(processed: Path = PROCESSED, download: Path = DOWNLOAD) -> Catalog:
+    "processed/catalog.json, built again if a source changed after it was written, reloaded when it is rewritten"
+    path = processed / CATALOG
+    if not path.exists() or path.stat().st_mtime < sources_mtime(download, processed):
+        log.info(f"build {path}")
+        build_catalog(download, processed).save(path)
+    return _load_catalog(path, path.stat().st_mtime)
+
+
+@lru_cache(maxsize=4)
+def _load_catalog(path: Path, mtime: float) -> Catalog:
+    return Catalog.load(path)
+
+
+def main(argv):
+    initialize_logging()
+    if len(argv) > 1:
+        for query in argv[1:]:
+            for record in catalog().lookup(query):
+                print(f"{record.key} {record.title}")
+                for source in SOURCES:
+                    for file in record.files.get(source, ()):
+                        print(f"    {source:<12} {file.id:<8} {file.path}")
+        return
+
+    result = build_catalog()
+    result.save(PROCESSED / CATALOG)
+    numbered = sum(record.no is not None for record in result.records)
+    log.info(f"{len(result.records)} hymns, {numbered} of 教會聖詩, written to {PROCESSED / CATALOG}")
+
+
+if __name__ == "__main__":
+    app.run(main)
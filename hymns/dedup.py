@@ -0,0 +1,237 @@
+"""Cluster near-duplicate hymns across processed/{mvccc,mvccc_choir,hoctoga,hoc5} with MinHash and LSH.
+
+The lyrics of every deck (and the .errata.txt/.raw.txt of the crawled sources) are cut into character shingles and
+summarized by a MinHash signature. Signatures are split into bands, hymns sharing any band are candidate pairs, so
+only similar hymns are ever compared. The decks of one source and their canonical version are written to
+processed/duplicates.json for search_hymn_ppt to collapse duplicates, every file of a cluster of any source and its
+canonical version to processed/fingerprints.json for hymns.catalog to join the records of the same lyrics.
+"""
+
+import json
+import zlib
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+
+import attr
+import numpy as np
+from absl import app, flags, logging as log
+
+from base import initialize_logging, log_every_n, span
+from hymns.fuzzy import normalize
+
+FLAGS = flags.FLAGS
+
+SHINGLE = 3
+NUM_PERM = 64
+BANDS = 16  # of NUM_PERM // BANDS rows, candidates are pairs with similarity above about (1 / BANDS) ** (1 / rows)
+PRIME = (1 << 31) - 1
+# the first one is the canonical version of a cluster, other things being equal.
+SOURCE_PRIORITY = ["mvccc", "mvccc_choir", "hoctoga", "hoc5"]
+DUPLICATES = "duplicates.json"
+FINGERPRINTS = "fingerprints.json"
+
+
+@attr.s
+class Document:
+    path: Path = attr.ib()
+    text: str = attr.ib(repr=False)  # normalized lyrics
+
+    @property
+    def source(self) -> str:
+        return self.path.parent.name
+
+
+def shingles(text: str, k: int = SHINGLE) -> np.ndarray:
+    "crc32 of the character k-grams, reduced to 31 bits"
+    grams = {text[i:i + k] for i in range(max(1, len(text) - k + 1))}
+    return np.array([zlib.crc32(gram.encode("utf-8")) & PRIME for gram in grams], dtype=np.uint64)
+
+
+@attr.s
+class MinHash:
+    a: np.ndarray = attr.ib(repr=False)
+    b: np.ndarray = attr.ib(repr=False)
+
+    @classmethod
+    def create(cls, num_perm: int = NUM_PERM, seed: int = 1) -> "MinHash":
+        rnd = np.random.RandomState(seed)
+        a = rnd.randint(1, PRIME, num_perm).astype(np.uint64)
+        b = rnd.randint(0, PRIME, num_perm).astype(np.uint64)
+        return cls(a, b)
+
+    def signature(self, text: str) -> np.ndarray:
+        # a * x + b < 2 ** 62 for 31 bit a, b and x, no overflow of uint64.
+        return ((np.outer(shingles(text), self.a) + self.b) % PRIME).min(axis=0)
+
+
+def similarity(sig1: np.ndarray, sig2: np.ndarray) -> float:
+    "estimated jaccard similarity of the shingles"
+    return float(np.mean(sig1 == sig2))
+
+
+def candidate_pairs(signatures: np.ndarray, bands: int = BANDS) -> Iterable[Tuple[int, int]]:
+    "pairs of rows sharing at least one band of their signatures"
+    rows = signatures.shape[1] // bands
+    seen = set()
+    for band in range(bands):
+        buckets: Dict[bytes, List[int]] = {}
+        for idx, sig in enumerate(signatures[:, band * rows:(band + 1) * rows]):
+            buckets.setdefault(sig.tobytes(), []).append(idx)
+        for bucket in buckets.values():
+            for i, first in enumerate(bucket):
+                for second in bucket[i + 1:]:
+                    if (first, second) not in seen:
+                        seen.add((first, second))
+                        yield first, second
+
+
+def jaccard(shingles1: np.ndarray, shingles2: np.ndarray) -> float:
+    "exact jaccard similarity of two sets of shingles"
+    common = len(np.intersect1d(shingles1, shingles2))
+    return common / (len(shingles1) + len(shingles2) - common)
+
+
+def clusters(signatures: np.ndarray, threshold: float, exact: List[np.ndarray] = None) -> List[List[int]]:
+    """connected components of the candidate pairs which are similar enough, singletons included.
+
+    exact: the shingles of each row, candidates are then compared by their exact similarity instead of the estimate,
+    e.g. a short song whose lyrics are a part of a longer one is estimated similar more often than it should be.
+    """
+    parent = list(range(len(signatures)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for first, second in candidate_pairs(signatures):
+        if exact is not None:
+            similar = jaccard(exact[first], exact[second])
+        else:
+            similar = similarity(signatures[first], signatures[second])
+        if similar >= threshold:
+            parent[find(first)] = find(second)
+
+    groups: Dict[int, List[int]] = {}
+    for idx in range(len(signatures)):
+        groups.setdefault(find(idx), []).append(idx)
+    return list(groups.values())
+
+
+def canonical(docs: List[Document]) -> Document:
+    "mvccc decks first, then the most complete lyrics, then the shortest name"
+    priority = {source: no for no, source in enumerate(SOURCE_PRIORITY)}
+    return min(
+        docs,
+        key=lambda doc: (
+            doc.path.suffix != ".pptx",
+            priority.get(doc.source, len(priority)),
+            -len(doc.text),
+            len(doc.path.name),
+            doc.path.name,
+        ),
+    )
+
+
+def load_documents(basepath: Path) -> List[Document]:
+    from pptx import Presentation
+
+    from mvccc.slides import extract_slides_text
+
+    docs = []
+    for path in sorted(basepath.glob("**/*.pptx")):
+        log_every_n(log.INFO, "extracting %s", path)
+        try:
+            slides = extract_slides_text(Presentation(path.as_posix()))
+            text = "".join(line for _, shapes in slides for lines in shapes for line in lines)
+        except Exception:
+            log.exception(f"failed to extract text from {path}.")
+            continue
+        docs.append(Document(path, normalize(text)))
+
+    # lyrics of crawled hymns without a deck, the errata is the corrected raw text.
+    texts: Dict[str, Path] = {}
+    for path in sorted(basepath.glob("**/*.raw.txt")) + sorted(basepath.glob("**/*.errata.txt")):
+        texts[path.as_posix().rsplit(".", 2)[0]] = path
+    for stem, path in sorted(texts.items()):
+        if not Path(f"{stem}.pptx").exists():
+            docs.append(Document(path, normalize(path.read_text())))
+
+    return [doc for doc in docs if doc.text]
+
+
+def find_duplicates(docs: List[Document], threshold: float) -> List[List[Document]]:
+    "clusters of more than one document, the canonical version first"
+    minhash = MinHash.create()
+    with span("minhash"):
+        exact = [np.unique(shingles(doc.text)) for doc in docs]
+        signatures = np.array([minhash.signature(doc.text) for doc in docs])
+    with span("lsh"):
+        groups = clusters(signatures, threshold, exact)
+
+    result = []
+    for group in groups:
+        if len(group) < 2:
+            continue
+        cluster = [docs[idx] for idx in group]
+        first = canonical(cluster)
+        result.append([first] + sorted((doc for doc in cluster if doc is not first), key=lambda doc: doc.path))
+    return sorted(result, key=lambda cluster: cluster[0].path)
+
+
+def save(found: List[List[Document]], basepath: Path) -> None:
+    "duplicates.json and fingerprints.json of the clusters, the paths are relative to basepath"
+    mapping, fingerprints = {}, {}
+    for cluster in found:
+        log.info(f"{cluster[0].path} <= {[doc.path.as_posix() for doc in cluster[1:]]}")
+        first = cluster[0].path.relative_to(basepath).as_posix()
+        for doc in cluster[1:]:
+            path = doc.path.relative_to(basepath).as_posix()
+            fingerprints[path] = first
+            # a choir arrangement is not a copy of the congregational deck, only the decks of one source are collapsed.
+            if cluster[0].path.suffix == doc.path.suffix == ".pptx" and doc.source == cluster[0].source:
+                mapping[path] = first
+
+    for name, content in ((DUPLICATES, mapping), (FINGERPRINTS, fingerprints)):
+        with (basepath / name).open("w") as out:
+            json.dump(content, out, ensure_ascii=False, indent=2, sort_keys=True)
+
+
+def duplicates(basepath: Path) -> Dict[str, str]:
+    "deck => its canonical deck of the same source, relative to basepath, empty if `make dedup` has not been run"
+    return _mapping(basepath / DUPLICATES)
+
+
+def fingerprints(basepath: Path) -> Dict[str, str]:
+    "file => the canonical version of its lyrics of any source, relative to basepath, empty if there is none"
+    return _mapping(basepath / FINGERPRINTS)
+
+
+def _mapping(path: Path) -> Dict[str, str]:
+    if not path.exists():
+        return {}
+    return _load_mapping(path, path.stat().st_mtime)
+
+
+@lru_cache(maxsize=4)
+def _load_mapping(path: Path, mtime: float) -> Dict[str, str]:
+    with path.open() as f:
+        return json.load(f)
+
+
+def main(argv):
+    basepath = Path(argv[1] if len(argv) > 1 else "processed")
+
+    initialize_logging()
+    docs = load_documents(basepath)
+    found = find_duplicates(docs, FLAGS.dedup_threshold)
+    save(found, basepath)
+    log.info(f"{len(found)} clusters of {sum(map(len, found))} duplicates in {len(docs)} hymns.")
+
+
+if __name__ == "__main__":
+    flags.DEFINE_float("dedup_threshold", 0.6, "jaccard similarity of the lyrics to be duplicates")
+
+    app.run(main)
@@ -3,20 +3,24 @@
 import asyncio
 import re
 from pathlib import Path
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
 from urllib.parse import urlparse
 
 from absl import app, flags, logging as log
-from aiohttp import ClientSession
-from bs4 import BeautifulSoup
 
+from base import log_every_n
 from hymns import TOTAL, fetch, zip_blank_lines
 
+if TYPE_CHECKING:
+    from aiohttp import ClientSession
+
 FLAGS = flags.FLAGS
 LYRICS_URL_TEMPLATE = "http://www.hoc5.net/service/hymn{level}/{idx:03d}.htm"
 
 
 def extract_lyrics(text: str, index: int, processed_basepath: Optional[Path] = None) -> str:
+    from bs4 import BeautifulSoup
+
     if processed_basepath is None:
         processed_basepath = Path(FLAGS.processed_basedir)
 
@@ -30,7 +34,7 @@ def extract_lyrics(text: str, index: int, processed_basepath: Optional[Path] = N
     raw_text = "\n".join(lines)
     raw_path = processed_basepath / f"{index:03d}_{title}.raw.txt"
     with raw_path.open("w") as out:
-        log.info(f"extract lyrics to {raw_path}")
+        log_every_n(log.INFO, "extract lyrics to %s", raw_path)
         out.write(raw_text)
 
     errata_path = processed_basepath / f"{index:03d}_{title}.errata.txt"
@@ -43,7 +47,7 @@ def extract_lyrics(text: str, index: int, processed_basepath: Optional[Path] = N
 
 
 async def download_and_extract_lyrics(
-    session: ClientSession, idx: int, download_basepath: Optional[Path] = None
+    session: "ClientSession", idx: int, download_basepath: Optional[Path] = None
 ) -> None:
     if download_basepath is None:
         download_basepath = Path(FLAGS.download_basedir)
@@ -56,7 +60,7 @@ async def download_and_extract_lyrics(
     try:
         # check cache, if exists use cache
         if lyrics_path.exists():
-            log.info(f"{lyrics_path} exists and use it as cache.")
+            log_every_n(log.INFO, "%s exists and use it as cache.", lyrics_path)
             with lyrics_path.open("rb") as f:
                 content = f.read()
         else:
@@ -77,7 +81,7 @@ async def download_and_extract_lyrics(
 
         # extract the lyrics
         try:
-            log.info(f"decoding content for {lyrics_url}")
+            log_every_n(log.INFO, "decoding content for %s", lyrics_url)
             text = content.decode()
         except UnicodeDecodeError:
             log.warn(f"ignore decoding errors for {lyrics_url}")
@@ -89,6 +93,8 @@ async def download_and_extract_lyrics(
 
 
 async def process_hymns() -> None:
+    from aiohttp import ClientSession
+
     async with ClientSession() as session:
         tasks = [download_and_extract_lyrics(session, idx) for idx in range(1, TOTAL + 1)]
         await asyncio.wait(tasks)
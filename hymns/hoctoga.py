@@ -5,16 +5,18 @@
 import asyncio
 from io import BytesIO
 from pathlib import Path
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
 from urllib.parse import urlparse
 from zipfile import ZipFile
 
 from absl import app, flags, logging as log
-from aiohttp import ClientSession
-from bs4 import BeautifulSoup
 
+from base import log_every_n
 from hymns import TOTAL, fetch, zip_blank_lines
 
+if TYPE_CHECKING:
+    from aiohttp import ClientSession
+
 FLAGS = flags.FLAGS
 
 LYRICS_URL_TEMPLATE = "http://www.hoctoga.org/Chinese/lyrics/hymn/hymn-{idx:03d}.htm"
@@ -22,6 +24,8 @@ PPT_URL_BASE = "http://www.hoctoga.org/Chinese/lyrics/hymn/"
 
 
 def extract_lyrics_and_ppt_link(text: str, index: int, processed_basepath: Optional[Path] = None) -> str:
+    from bs4 import BeautifulSoup
+
     if processed_basepath is None:
         processed_basepath = Path(FLAGS.processed_basedir)
 
@@ -35,7 +39,7 @@ def extract_lyrics_and_ppt_link(text: str, index: int, processed_basepath: Optio
     raw_text = "\n".join(lines)
     raw_path = processed_basepath / f"{index:03d}_{title}.raw.txt"
     with raw_path.open("w") as out:
-        log.info(f"extract lyrics to {raw_path}")
+        log_every_n(log.INFO, "extract lyrics to %s", raw_path)
         out.write(raw_text)
 
     errata_path = processed_basepath / f"{index:03d}_{title}.errata.txt"
@@ -53,13 +57,13 @@ async def download_and_extract_ppt(ppt_zip_link: str, index: int, download_basep
     if download_basepath is None:
         download_basepath = Path(FLAGS.download_basedir)
 
-    log.info(f"processing {ppt_zip_link}")
+    log_every_n(log.INFO, "processing %s", ppt_zip_link)
     t = urlparse(ppt_zip_link)
     assert t.path.endswith("hymn-{index:03}.zip")
 
     ppt_zip_path = download_basepath / Path(t.path).name
     if ppt_zip_path.exists():
-        log.info(f"{ppt_zip_path} exists. use it as cache.")
+        log_every_n(log.INFO, "%s exists. use it as cache.", ppt_zip_path)
         with ppt_zip_path.open("rb") as f:
             content = f.read()
     else:
@@ -79,13 +83,15 @@ async def download_and_extract_ppt(ppt_zip_link: str, index: int, download_basep
             log.error(f"status={status}")
             return
 
-    log.info(f"extract {ppt_zip_path}")
+    log_every_n(log.INFO, "extract %s", ppt_zip_path)
     zf = ZipFile(BytesIO(content))
     infolist = zf.infolist()
     assert len(infolist) == 1
 
 
-async def download_lyrics_with_ppt(session: ClientSession, idx: int, download_basepath: Optional[Path] = None) -> None:
+async def download_lyrics_with_ppt(
+    session: "ClientSession", idx: int, download_basepath: Optional[Path] = None
+) -> None:
     if download_basepath is None:
         download_basepath = Path(FLAGS.download_basedir)
 
@@ -96,7 +102,7 @@ async def download_lyrics_with_ppt(session: ClientSession, idx: int, download_ba
     try:
         # check cache, if exists use cache
         if lyrics_path.exists():
-            log.info(f"{lyrics_path} exists and use it as cache.")
+            log_every_n(log.INFO, "%s exists and use it as cache.", lyrics_path)
             with lyrics_path.open("rb") as f:
                 content = f.read()
         else:
@@ -117,7 +123,7 @@ async def download_lyrics_with_ppt(session: ClientSession, idx: int, download_ba
 
         # extract the lyrics and the ppt link
         try:
-            log.info(f"decoding content for {lyrics_url}")
+            log_every_n(log.INFO, "decoding content for %s", lyrics_url)
             text = content.decode("big5", errors="strict")
         except UnicodeDecodeError:
             log.warn(f"ignore decoding errors for {lyrics_url}")
@@ -130,6 +136,8 @@ async def download_lyrics_with_ppt(session: ClientSession, idx: int, download_ba
 
 
 async def process_all_hymns():
+    from aiohttp import ClientSession
+
     async with ClientSession() as session:
         tasks = [download_lyrics_with_ppt(session, idx) for idx in range(1, TOTAL + 1)]
         await asyncio.wait(tasks)
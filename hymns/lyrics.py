@@ -6,6 +6,8 @@ from typing import Dict
 import attr
 from absl import logging as log
 
+from base import log_every_n
+
 
 @attr.s
 class Lyrics:
@@ -54,6 +56,6 @@ def parse_raw_text(raw_text, title, index):
     lyrics = Lyrics(title, paragraphs)
     d = attr.asdict(lyrics)
     json_path = DOWNLOAD / f"{index:03d}_{title}.json"
-    log.info(f"write structured lyrics to {json_path}")
+    log_every_n(log.INFO, "write structured lyrics to %s", json_path)
     with json_path.open("w") as out:
         json.dump(d, out, indent=4)
@@ -4,16 +4,17 @@
 
 import asyncio
 from pathlib import Path
-from typing import List, Optional
+from typing import TYPE_CHECKING, List, Optional
 from urllib.parse import urlparse
 
 import attr
 from absl import app, flags, logging as log
-from aiohttp import ClientSession
-from bs4 import BeautifulSoup
 
 from hymns import fetch
 
+if TYPE_CHECKING:
+    from aiohttp import ClientSession
+
 FLAGS = flags.FLAGS
 HYMNS_INDEX_URL = "http://mvcccit.org/Legacy/chinese/?content=it/song.htm"
 
@@ -35,7 +36,9 @@ def _path(hymn: Hymn, download_basepath: Optional[Path] = None) -> Path:
     return path
 
 
-async def index(session: ClientSession, url: str, download_basepath: Optional[Path] = None) -> List[Hymn]:
+async def index(session: "ClientSession", url: str, download_basepath: Optional[Path] = None) -> List[Hymn]:
+    from bs4 import BeautifulSoup
+
     if download_basepath is None:
         download_basepath = Path(FLAGS.download_basedir)
 
@@ -71,12 +74,12 @@ async def index(session: ClientSession, url: str, download_basepath: Optional[Pa
     return hymns
 
 
-async def download(session: ClientSession, hymn: Hymn) -> None:
+async def download(session: "ClientSession", hymn: Hymn) -> None:
     if _path(hymn).exists():
-        log.debug(f"{_path(hymn)} is already downloaded.")
+        log.debug("%s is already downloaded.", _path(hymn))
         return
 
-    log.debug(f"downloading to {_path(hymn)} ...")
+    log.debug("downloading to %s ...", _path(hymn))
     try:
         status, content = await fetch(session, hymn.url)
         assert status == 200
@@ -87,6 +90,8 @@ async def download(session: ClientSession, hymn: Hymn) -> None:
 
 
 async def download_pptx() -> None:
+    from aiohttp import ClientSession
+
     async with ClientSession() as session:
         hymns = await index(session, HYMNS_INDEX_URL)
         tasks = [download(session, hymn) for hymn in hymns]
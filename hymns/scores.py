@@ -0,0 +1,207 @@
+"""Scores of zanmei: the downloaded {no:03d}_{name}.png rewritten smaller, a thumbnail for the web and a perceptual
+hash of each, so the app shows a score without opening the full size image and the same score under two numbers
+is found without comparing hundreds of images.
+
+The images are processed in a process pool, an image is only replaced when it decodes to the same pixels. The
+results are kept in download/zanmei/scores.json with the mtime of their image, so only new images are processed
+again. The hash is a difference hash, the sign of the gradient of every row of the image shrunk to 17x16, two
+scores are the same when their hashes differ in only a few of the 256 bits.
+"""
+
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from io import BytesIO
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import attr
+import numpy as np
+from absl import app, flags, logging as log
+
+from base import initialize_logging, span
+from hymns.catalog import hymnal_no
+
+FLAGS = flags.FLAGS
+
+ZANMEI = Path("download/zanmei")
+SCORES = "scores.json"
+THUMBNAILS = "thumbnails"
+HASH_SIZE = 16  # bits of a row and rows of the hash
+
+
+class Score(NamedTuple):
+    path: str
+    no: Optional[int]  # 教會聖詩 number of the name
+    mtime: float  # of the image after it is optimized
+    before: int  # bytes
+    after: int
+    size: Tuple[int, int]  # width, height
+    thumbnail: str
+    hash: str  # hex of the difference hash
+    error: str  # why the image is kept as it is, empty if it is optimized or already small
+
+
+def dhash(im, size: int = HASH_SIZE) -> str:
+    from PIL import Image
+
+    pixels = np.asarray(im.convert("L").resize((size + 1, size), Image.Resampling.LANCZOS), dtype=np.int16)
+    return np.packbits(pixels[:, 1:] > pixels[:, :-1]).tobytes().hex()
+
+
+def distances(hashes: List[str]) -> np.ndarray:
+    "number of different bits of every pair of hashes"
+    bits = np.unpackbits(np.array([np.frombuffer(bytes.fromhex(h), dtype=np.uint8) for h in hashes]), axis=1)
+    return (bits[:, None, :] != bits[None, :, :]).sum(axis=2)
+
+
+def same_pixels(a, b) -> bool:
+    return a.size == b.size and np.array_equal(np.asarray(a.convert("RGBA")), np.asarray(b.convert("RGBA")))
+
+
+def optimize(im) -> bytes:
+    "the smallest mode the pixels fit in, e.g. the rgb of a black and white score is L or a palette"
+    if im.mode in ("RGBA", "LA") and im.getchannel("A").getextrema() == (255, 255):
+        im = im.convert(im.mode[:-1])
+    if im.mode == "RGB":
+        r, g, b = im.split()
+        if r == g == b:
+            im = r
+        elif im.getcolors(256) is not None:
+            im = im.quantize(colors=256, method=0)
+    out = BytesIO()
+    im.save(out, "PNG", optimize=True)
+    return out.getvalue()
+
+
+def process(path: Path, thumbnail_width: int, dry_run: bool = False) -> Score:
+    from PIL import Image
+
+    data = path.read_bytes()
+    with Image.open(BytesIO(data)) as im:
+        im.load()
+    hashed = dhash(im)
+
+    thumbnail = path.parent / THUMBNAILS / path.name
+    if not dry_run:
+        small = im.convert("RGBA" if "A" in im.getbands() else "RGB")
+        small.thumbnail((thumbnail_width, thumbnail_width * 4), Image.Resampling.LANCZOS)
+        thumbnail.parent.mkdir(exist_ok=True)
+        thumbnail.write_bytes(optimize(small))
+
+    no = hymnal_no(path.name.split("_", 1)[0])
+    mtime = path.stat().st_mtime
+    score = Score(path.as_posix(), no, mtime, len(data), len(data), im.size, thumbnail.as_posix(), hashed, "")
+    try:
+        optimized = optimize(im)
+    except Exception as e:
+        return score._replace(error=repr(e))
+    if len(optimized) >= len(data):
+        return score
+    with Image.open(BytesIO(optimized)) as check:
+        if not same_pixels(im, check):
+            return score._replace(error="pixels changed")
+
+    if not dry_run:
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp.write_bytes(optimized)
+        os.replace(tmp, path)
+    return score._replace(mtime=path.stat().st_mtime, after=len(optimized))
+
+
+@attr.s
+class Scores:
+    scores: List[Score] = attr.ib(repr=False)
+    by_path: Dict[str, Score] = attr.ib(init=False, repr=False)
+
+    def __attrs_post_init__(self):
+        self.by_path = {score.path: score for score in self.scores}
+
+    def thumbnail(self, path: str) -> Optional[str]:
+        score = self.by_path.get(path)
+        return score.thumbnail if score and Path(score.thumbnail).exists() else None
+
+    def duplicates(self, max_distance: int) -> List[Tuple[Score, Score, int]]:
+        "pairs of scores which look the same, i.e. one image is downloaded for two numbers, or a name is wrong"
+        if len(self.scores) < 2:
+            return []
+        d = distances([score.hash for score in self.scores])
+        pairs = np.nonzero(np.triu(d <= max_distance, k=1))
+        return [(self.scores[i], self.scores[j], int(d[i, j])) for i, j in zip(*pairs)]
+
+    def save(self, path: Path) -> None:
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with tmp.open("w") as out:
+            json.dump([score._asdict() for score in self.scores], out, ensure_ascii=False, indent=1)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path) -> "Scores":
+        with path.open() as f:
+            return cls([Score(**{**d, "size": tuple(d["size"])}) for d in json.load(f)])
+
+
+def update(basepath: Path = ZANMEI, thumbnail_width: int = 600, workers: int = 0, dry_run: bool = False) -> Scores:
+    "process the images which are new or changed since scores.json"
+    index_path = basepath / SCORES
+    cached = Scores.load(index_path).by_path if index_path.exists() else {}
+
+    with os.scandir(basepath) as entries:
+        images = sorted((entry.name, entry.stat().st_mtime) for entry in entries if entry.name.endswith(".png"))
+    paths, scores = [], {}
+    for name, mtime in images:
+        path = basepath / name
+        score = cached.get(path.as_posix())
+        if score is not None and score.mtime == mtime and Path(score.thumbnail).exists():
+            scores[name] = score
+        else:
+            paths.append(path)
+
+    with span("scores"), ProcessPoolExecutor(max_workers=workers or None) as pool:
+        n = len(paths)
+        for path, score in zip(paths, pool.map(process, paths, [thumbnail_width] * n, [dry_run] * n, chunksize=4)):
+            if score.error:
+                log.warning(f"{score.path} is kept as it is: {score.error}")
+            elif score.after < score.before:
+                log.info(f"{score.path} {score.before:>9,d} => {score.after:>9,d} bytes")
+            scores[path.name] = score
+
+    result = Scores([scores[name] for name, _ in images])
+    if not dry_run:
+        result.save(index_path)
+    return result
+
+
+def scores(basepath: Path = ZANMEI) -> Optional[Scores]:
+    "the index written by `make scores`, reloaded when it is rewritten, None if there is none"
+    path = basepath / SCORES
+    if not path.exists():
+        return None
+    return _load_scores(path, path.stat().st_mtime)
+
+
+@lru_cache(maxsize=4)
+def _load_scores(path: Path, mtime: float) -> Scores:
+    return Scores.load(path)
+
+
+def main(argv):
+    basepath = Path(argv[1] if len(argv) > 1 else ZANMEI)
+
+    initialize_logging()
+    result = update(basepath, FLAGS.scores_thumbnail_width, FLAGS.scores_workers, FLAGS.scores_dry_run)
+    before, after = sum(s.before for s in result.scores), sum(s.after for s in result.scores)
+    log.info(f"{len(result.scores)} scores, {before:,d} => {after:,d} bytes, saved {before - after:,d}.")
+
+    for a, b, distance in result.duplicates(FLAGS.scores_distance):
+        print(f"{distance:>3d} {a.path} {b.path}")
+
+
+if __name__ == "__main__":
+    flags.DEFINE_integer("scores_thumbnail_width", 600, "width of the thumbnails in pixels")
+    flags.DEFINE_integer("scores_distance", 12, "scores whose hashes differ in at most so many bits look the same")
+    flags.DEFINE_integer("scores_workers", 0, "number of processes, the number of cpus by default")
+    flags.DEFINE_bool("scores_dry_run", False, "only report the bytes saved and the duplicates, nothing is written")
+
+    app.run(main)
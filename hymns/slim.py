@@ -0,0 +1,153 @@
+"""Slim the decks of processed/: drop the unused layouts and masters, the thumbnail and duplicated media, and
+recompress the zip.
+
+Every deck carries the 11 layouts of its template and a thumbnail, which are about half of processed/. The decks
+are rewritten in a process pool, and a deck is only replaced when extract_slides_text sees the same text in it.
+"""
+
+import hashlib
+import os
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, NamedTuple
+
+from absl import app, flags, logging as log
+
+from base import initialize_logging, span
+
+if TYPE_CHECKING:
+    from pptx import Presentation
+
+FLAGS = flags.FLAGS
+
+THUMBNAIL = "http://schemas.openxmlformats.org/package/2006/relationships/metadata/thumbnail"
+
+
+class Slimmed(NamedTuple):
+    path: str
+    before: int  # bytes
+    after: int
+    load_before: float  # ms to open the deck
+    load_after: float
+    error: str  # why the deck is kept as it is, empty if it is slimmed
+
+
+def drop_unused_layouts(ppt: "Presentation") -> None:
+    "layouts no slide is based on, and masters left without any layout"
+    masters = ppt.slide_masters
+    for master in list(masters):
+        for layout in list(master.slide_layouts):
+            if not layout.used_by_slides:
+                # the parts only the layout refers to, e.g. its images, are dropped with it.
+                master.slide_layouts.remove(layout)
+
+    for idx, master in reversed(list(enumerate(masters))):
+        if len(master.slide_layouts) == 0 and len(masters) > 1:
+            master_id = masters._sldMasterIdLst.sldMasterId_lst[idx]
+            masters._sldMasterIdLst.remove(master_id)
+            ppt.part.drop_rel(master_id.rId)
+
+
+def drop_thumbnail(ppt: "Presentation") -> None:
+    rels = ppt.part.package._rels
+    for rId in [rId for rId, rel in rels.items() if rel.reltype == THUMBNAIL]:
+        rels.pop(rId)
+
+
+def dedup_media(ppt: "Presentation") -> None:
+    "point all the references to the same image or video to one part, the other copies are not saved"
+    first: Dict[bytes, object] = {}
+    for part in list(ppt.part.package.iter_parts()):
+        for rel in part.rels.values():
+            if rel.is_external or "/media/" not in str(rel.target_part.partname):
+                continue
+            digest = hashlib.sha1(rel.target_part.blob).digest()
+            # python-pptx has no api to retarget a relationship.
+            rel._target = first.setdefault(digest, rel.target_part)
+
+
+def recompress(data: bytes, level: int = 9) -> bytes:
+    out = BytesIO()
+    with zipfile.ZipFile(BytesIO(data)) as src, zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as dst:
+        for info in src.infolist():
+            dst.writestr(info, src.read(info), compress_type=zipfile.ZIP_DEFLATED, compresslevel=level)
+    return out.getvalue()
+
+
+def slim(data: bytes) -> bytes:
+    from pptx import Presentation
+
+    ppt = Presentation(BytesIO(data))
+    drop_unused_layouts(ppt)
+    drop_thumbnail(ppt)
+    dedup_media(ppt)
+
+    out = BytesIO()
+    ppt.save(out)
+    return recompress(out.getvalue())
+
+
+def load_ms(data: bytes, repeat: int = 3) -> float:
+    from pptx import Presentation
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        Presentation(BytesIO(data))
+        timings.append((time.perf_counter() - start) * 1000)
+    return min(timings)
+
+
+def slim_file(path: Path, dry_run: bool = False) -> Slimmed:
+    from pptx import Presentation
+
+    from mvccc.slides import extract_slides_text
+
+    data = path.read_bytes()
+    load_before = load_ms(data)
+    try:
+        slimmed = slim(data)
+    except Exception as e:
+        return Slimmed(path.as_posix(), len(data), len(data), load_before, load_before, repr(e))
+
+    load_after = load_ms(slimmed)
+    if len(slimmed) >= len(data):
+        return Slimmed(path.as_posix(), len(data), len(data), load_before, load_before, "not smaller")
+    texts = [list(extract_slides_text(Presentation(BytesIO(deck)))) for deck in (data, slimmed)]
+    if texts[0] != texts[1]:
+        return Slimmed(path.as_posix(), len(data), len(data), load_before, load_before, "text changed")
+
+    if not dry_run:
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp.write_bytes(slimmed)
+        os.replace(tmp, path)
+    return Slimmed(path.as_posix(), len(data), len(slimmed), load_before, load_after, "")
+
+
+def main(argv):
+    basepath = Path(argv[1] if len(argv) > 1 else "processed")
+
+    initialize_logging()
+    paths = sorted(basepath.glob("**/*.pptx"))
+    before = after = 0
+    with span("slim"), ProcessPoolExecutor(max_workers=FLAGS.slim_workers or None) as pool:
+        for result in pool.map(slim_file, paths, [FLAGS.slim_dry_run] * len(paths), chunksize=4):
+            before, after = before + result.before, after + result.after
+            if result.error:
+                log.warning(f"{result.path} is kept as it is: {result.error}")
+                continue
+            log.info(
+                f"{result.path} {result.before:>9,d} => {result.after:>9,d} bytes, "
+                f"{result.load_before:6.1f} => {result.load_after:6.1f} ms to open"
+            )
+    log.info(f"{len(paths)} decks, {before:,d} => {after:,d} bytes, saved {before - after:,d}.")
+
+
+if __name__ == "__main__":
+    flags.DEFINE_integer("slim_workers", 0, "number of processes, the number of cpus by default")
+    flags.DEFINE_bool("slim_dry_run", False, "only report the bytes and time saved, the decks are not rewritten")
+
+    app.run(main)
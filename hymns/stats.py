@@ -1,53 +1,75 @@
 #!/usr/bin/env python
+"""Coverage of the 教會聖詩 hymns: which sources have the lyrics, a deck, the score and an errata of each hymn."""
 
-import os
-from collections import defaultdict
-from os.path import join
+import json
 from pathlib import Path
+from typing import Dict, List
 
-from absl import app, logging as log
+from absl import app, flags, logging as log
 
-from comm import TOTAL, init_logging
+from base import initialize_logging, span
+from hymns import TOTAL
+from hymns.catalog import SOURCES, Catalog, SourceFile, build_catalog
 
-PROCESSED = Path("processed")
-DOWNLOAD = Path("download")
+FLAGS = flags.FLAGS
 
+KINDS = ["lyrics", "pptx", "score", "errata"]
 
-def all_titles():
-    d = {}
-    for _, _, files in os.walk(DOWNLOAD / "zanmei"):
-        for filename in files:
-            if not filename.endswith(".png"):
-                continue
-            idx, name = filename.split("_", 1)
-            d[idx] = name[:-4]  # .png
+Coverage = Dict[int, Dict[str, List[str]]]  # no => kind => sources
 
-    return d
 
+def kinds(file: SourceFile) -> List[str]:
+    if file.path.endswith(".errata.txt"):
+        return ["lyrics", "errata"]
+    if file.path.endswith(".txt"):
+        return ["lyrics"]
+    if file.path.endswith(".pptx"):
+        return ["pptx"]
+    return ["score"]
 
-def has_lyrics():
-    d = defaultdict(list)
-    for dir_, _, files in os.walk(PROCESSED):
-        for filename in files:
-            try:
-                idx, name = filename.split("_", 1)
-                d[idx].append(join(dir_, filename))
-            except Exception:
-                log.exception(f"exception processing {filename} =>")
 
-    return d
+def coverage(catalog: Catalog) -> Coverage:
+    result: Coverage = {no: {kind: [] for kind in KINDS} for no in range(1, TOTAL + 1)}
+    for record in catalog.records:
+        if record.no is None:
+            continue
+        for source in SOURCES:
+            for file in record.files.get(source, ()):
+                for kind in kinds(file):
+                    if source not in result[record.no][kind]:
+                        result[record.no][kind].append(source)
+    return result
+
+
+def titles(catalog: Catalog) -> Dict[int, str]:
+    return {record.no: record.title for record in catalog.records if record.no is not None}
 
 
 def main(argv):
     del argv
-    init_logging()
-    titles = all_titles()
-    lyrics = has_lyrics()
-    for idx in range(1, TOTAL + 1):
-        fidx = f"{idx:03d}"
-        matches = lyrics.get(fidx, "missing")
-        log.info(f"{fidx} = {titles.get(fidx)} => {matches}")
+    initialize_logging()
+
+    with span("build_catalog"):
+        catalog = build_catalog()
+    result = coverage(catalog)
+    names = titles(catalog)
+
+    if FLAGS.stats_json:
+        table = {no: {"title": names.get(no), **by_kind} for no, by_kind in result.items()}
+        with Path(FLAGS.stats_json).open("w") as out:
+            json.dump(table, out, ensure_ascii=False)
+        log.info(f"write coverage to {FLAGS.stats_json}")
+    else:
+        print(f"{'no':>3} {'title':<20}" + "".join(f" {kind:<20}" for kind in KINDS))
+        for no, by_kind in result.items():
+            row = "".join(f" {','.join(by_kind[kind]) or '-':<20}" for kind in KINDS)
+            print(f"{no:03d} {names.get(no, 'missing'):<20}{row}")
+
+    counts = {kind: sum(bool(by_kind[kind]) for by_kind in result.values()) for kind in KINDS}
+    log.info(f"of {TOTAL} hymns: {counts}")
 
 
 if __name__ == "__main__":
+    flags.DEFINE_string("stats_json", "", "write the coverage as json to this file instead of a table")
+
     app.run(main)
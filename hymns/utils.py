@@ -1,17 +1,42 @@
-from typing import Tuple
+import time
+from typing import TYPE_CHECKING, Tuple
+from urllib.parse import urlparse
 
 from absl import flags, logging as log
-from aiohttp import ClientSession
+
+import metrics
+from base import log_every_n
+
+if TYPE_CHECKING:
+    from aiohttp import ClientSession
 
 FLAGS = flags.FLAGS
 
+HTTP_REQUESTS = metrics.counter("http_requests_total", "HTTP requests by host and status")
+HTTP_FETCHED_BYTES = metrics.counter("http_fetched_bytes_total", "Bytes of HTTP responses by host")
+CRAWL_ERRORS = metrics.counter("crawl_errors_total", "Failed HTTP requests (exception or status >= 400) by host")
+FETCH_SECONDS = metrics.histogram("fetch_seconds", "Latency of HTTP requests by host")
+
+
+async def fetch(session: "ClientSession", url: str) -> Tuple[int, str]:
+    log_every_n(log.INFO, "fetching %s", url)
+    host = urlparse(url).netloc
+    start = time.perf_counter()
+    try:
+        async with session.get(url) as response:
+            status = response.status
+            content = await response.content.read()
+    except Exception:
+        CRAWL_ERRORS.inc(host=host)
+        raise
+    finally:
+        FETCH_SECONDS.observe(time.perf_counter() - start, host=host)
 
-async def fetch(session: ClientSession, url: str) -> Tuple[int, str]:
-    log.info(f"fetching {url}")
-    async with session.get(url) as response:
-        status = response.status
-        content = await response.content.read()
-        return status, content
+    HTTP_REQUESTS.inc(host=host, status=status)
+    HTTP_FETCHED_BYTES.inc(len(content), host=host)
+    if status >= 400:
+        CRAWL_ERRORS.inc(host=host)
+    return status, content
 
 
 def zip_blank_lines(lines):
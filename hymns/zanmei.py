@@ -5,17 +5,17 @@
 import asyncio
 import re
 from pathlib import Path
-from typing import List, Optional
+from typing import TYPE_CHECKING, List, Optional
 from urllib.parse import urlparse
 
 import attr
 from absl import app, flags, logging as log
-from aiohttp import ClientSession
-from bs4 import BeautifulSoup
-from hanziconv import HanziConv
 
 from hymns import fetch
 
+if TYPE_CHECKING:
+    from aiohttp import ClientSession
+
 # 教會聖詩 Hymns for God's People
 HYMNS_INDEX_URL = "https://www.zanmeishi.com/songbook/hymns-for-gods-people.html"
 ZANMEI_HOMEPAGE = "https://www.zanmeishi.com"
@@ -37,7 +37,10 @@ def _path(hymn: Hymn, download_basepath: Optional[Path] = None) -> Path:
     return path
 
 
-async def index(session: ClientSession, url: str, download_basepath: Optional[Path] = None) -> List[Hymn]:
+async def index(session: "ClientSession", url: str, download_basepath: Optional[Path] = None) -> List[Hymn]:
+    from bs4 import BeautifulSoup
+    from hanziconv import HanziConv
+
     t = urlparse(url)
     if download_basepath is None:
         download_basepath = Path(FLAGS.download_basedir)
@@ -86,12 +89,14 @@ async def index(session: ClientSession, url: str, download_basepath: Optional[Pa
     return hymns
 
 
-async def download(session: ClientSession, hymn: Hymn) -> None:
+async def download(session: "ClientSession", hymn: Hymn) -> None:
+    from bs4 import BeautifulSoup
+
     if _path(hymn).exists():
-        log.debug(f"{_path(hymn)} is already downloaded.")
+        log.debug("%s is already downloaded.", _path(hymn))
         return
 
-    log.debug(f"downloading to {_path(hymn)} ...")
+    log.debug("downloading to %s ...", _path(hymn))
     try:
         status, content = await fetch(session, hymn.url)
         assert status == 200
@@ -120,6 +125,8 @@ def verify(path: Path, glob: str, total: int) -> None:
 
 
 async def download_image_copy(download_basepath: Optional[Path] = None) -> None:
+    from aiohttp import ClientSession
+
     if download_basepath is None:
         download_basepath = Path(FLAGS.download_basedir)
 
@@ -0,0 +1,234 @@
+"""In-process counters and histograms.
+
+Rendered in the prometheus text format by serve() when running as a server, or logged as a summary table at exit
+of CLI runs (see base.initialize_logging).
+"""
+
+import bisect
+import functools
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+
+import attr
+from absl import flags, logging as log
+
+FLAGS = flags.FLAGS
+
+flags.DEFINE_integer("metrics_port", 9464, "Port of the prometheus /metrics endpoint when running as a server")
+
+Labels = Tuple[Tuple[str, str], ...]
+
+# prometheus client default buckets, in seconds.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _labels(labels: Dict[str, object]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(labels: Labels, extra: Labels = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+@attr.s
+class Counter:
+    name: str = attr.ib()
+    help: str = attr.ib()
+    values: Dict[Labels, float] = attr.ib(factory=dict)
+    lock: threading.Lock = attr.ib(factory=threading.Lock, repr=False, eq=False)
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = _labels(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self.values.get(_labels(labels), 0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            lines.extend(f"{self.name}{_format_labels(k)} {v:g}" for k, v in sorted(self.values.items()))
+        return lines
+
+    def summary(self) -> List[str]:
+        with self.lock:
+            return [f"{self.name}{_format_labels(k):<60} {v:>12g}" for k, v in sorted(self.values.items())]
+
+
+@attr.s
+class _Observations:
+    buckets: List[int] = attr.ib()
+    count: int = attr.ib(default=0)
+    sum: float = attr.ib(default=0.0)
+    max: float = attr.ib(default=0.0)
+
+
+@attr.s
+class Histogram:
+    name: str = attr.ib()
+    help: str = attr.ib()
+    buckets: Tuple[float, ...] = attr.ib(default=DEFAULT_BUCKETS)
+    values: Dict[Labels, _Observations] = attr.ib(factory=dict)
+    lock: threading.Lock = attr.ib(factory=threading.Lock, repr=False, eq=False)
+
+    def observe(self, value: float, **labels) -> None:
+        key = _labels(labels)
+        with self.lock:
+            obs = self.values.get(key)
+            if obs is None:
+                obs = self.values[key] = _Observations([0] * len(self.buckets))
+            idx = bisect.bisect_left(self.buckets, value)
+            if idx < len(self.buckets):
+                obs.buckets[idx] += 1
+            obs.count += 1
+            obs.sum += value
+            obs.max = max(obs.max, value)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            for key, obs in sorted(self.values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, obs.buckets):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_format_labels(key, (('le', f'{bound:g}'),))} {cumulative}")
+                lines.append(f"{self.name}_bucket{_format_labels(key, (('le', '+Inf'),))} {obs.count}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {obs.sum:g}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {obs.count}")
+        return lines
+
+    def summary(self) -> List[str]:
+        with self.lock:
+            return [
+                f"{self.name}{_format_labels(k):<60} count={obs.count:<6d} "
+                f"mean={obs.sum / obs.count:.4f} max={obs.max:.4f}"
+                for k, obs in sorted(self.values.items())
+            ]
+
+
+@attr.s
+class Registry:
+    metrics: Dict[str, object] = attr.ib(factory=dict)
+    lock: threading.Lock = attr.ib(factory=threading.Lock, repr=False, eq=False)
+
+    def _get(self, klass, name: str, help: str, **kwargs):
+        with self.lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = klass(name, help, **kwargs)
+            assert isinstance(metric, klass), f"{name} is already registered as {type(metric).__name__}."
+            return metric
+
+    def counter(self, name: str, help: str = "") -> Counter:
+        return self._get(Counter, name, help)
+
+    def histogram(self, name: str, help: str = "", buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, help, buckets=buckets)
+
+    def render(self) -> str:
+        "prometheus text exposition format"
+        lines: List[str] = []
+        for name in sorted(self.metrics):
+            lines.extend(self.metrics[name].render())
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> List[str]:
+        lines: List[str] = []
+        for name in sorted(self.metrics):
+            lines.extend(self.metrics[name].summary())
+        return lines
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, help: str = "") -> Counter:
+    return REGISTRY.counter(name, help)
+
+
+def histogram(name: str, help: str = "", buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+    return REGISTRY.histogram(name, help, buckets)
+
+
+CACHE_REQUESTS = counter("cache_requests_total", "Lookups of a cache, hits = requests - misses")
+CACHE_MISSES = counter("cache_misses_total", "Lookups which are not found in the cache")
+
+
+def count_cache(cache: str, maxsize: Optional[int] = 128) -> Callable[[Callable], Callable]:
+    """functools.lru_cache which counts its requests and misses
+
+    The miss is counted in the cached function, which only runs on a miss, as the st.cache_data functions of the
+    app do, so the count holds across threads and cache_clear().
+    """
+
+    def decorator(func: Callable) -> Callable:
+        @functools.lru_cache(maxsize=maxsize)
+        @functools.wraps(func)
+        def missed(*args, **kwargs):
+            CACHE_MISSES.inc(cache=cache)
+            return func(*args, **kwargs)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            CACHE_REQUESTS.inc(cache=cache)
+            return missed(*args, **kwargs)
+
+        wrapper.cache_info = missed.cache_info
+        wrapper.cache_clear = missed.cache_clear
+        return wrapper
+
+    return decorator
+
+
+def log_summary() -> None:
+    "summary table of all metrics, registered to run at exit of CLI runs"
+    lines = REGISTRY.summary()
+    if lines:
+        log.info("metrics summary:\n" + "\n".join(lines))
+
+
+# ------------------------------------------------------------------------------
+
+_server: Optional[ThreadingHTTPServer] = None
+_server_lock = threading.Lock()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        log.debug(format, *args)
+
+
+def serve(port: Optional[int] = None) -> Optional[ThreadingHTTPServer]:
+    "serve /metrics from a daemon thread, only the first call in a process starts the server."
+    global _server
+
+    if port is None:
+        port = FLAGS.metrics_port
+    with _server_lock:
+        if _server is None and port:
+            try:
+                _server = ThreadingHTTPServer(("", port), _MetricsHandler)
+            except OSError:
+                log.exception(f"failed to serve metrics on port {port}.")
+                return None
+            threading.Thread(target=_server.serve_forever, name="metrics", daemon=True).start()
+            log.info(f"serving prometheus metrics on http://localhost:{port}/metrics")
+
+    return _server
@@ -0,0 +1,120 @@
+"""Decks keyed by the hash of their inputs, so rebuilding an unchanged Sunday is reading one file.
+
+pptx_bytes writes the zip with fixed timestamps, the same inputs always give the same bytes. The key is the sha256
+of the service, the template, the version of the corpus (the mtime and size of every hymn deck, duplicates.json and
+the bible) and the source of the modules which look up the hymns and verses, so a deck is rebuilt whenever anything
+it is made of changes.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import attr
+from absl import flags, logging as log
+
+import metrics
+
+FLAGS = flags.FLAGS
+
+flags.DEFINE_string("deck_cache_dir", "cache/decks", "directory of the decks keyed by their inputs, empty to disable")
+flags.DEFINE_integer("deck_cache_size", 64, "number of the most recently used decks to keep")
+
+ROOT = Path(__file__).parent.parent
+DUPLICATES = "duplicates.json"  # written by hymns.dedup, which imports numpy.
+# the code which makes the slides and finds their hymns and verses.
+CODE = [
+    ROOT / name
+    for name in [
+        "mvccc/slides.py",
+        "hymns/fuzzy.py",
+        "hymns/dedup.py",
+        "romanize.py",
+        "bible/books.py",
+        "bible/index.py",
+        "bible/scripture.py",
+    ]
+]
+
+
+def _stat(path: Path) -> Optional[Tuple[float, int]]:
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return None
+    return st.st_mtime, st.st_size
+
+
+def _decks(basepath: Path) -> Iterable[Tuple[str, int, int]]:
+    "(path, mtime, size) of every deck, a deck rewritten in place does not change the mtime of its directory"
+    with os.scandir(basepath) as entries:
+        for entry in entries:
+            if entry.is_dir():
+                yield from _decks(Path(entry.path))
+            elif entry.name.endswith(".pptx"):
+                st = entry.stat()
+                yield entry.path, st.st_mtime_ns, st.st_size
+
+
+def corpus_version(processed: Path) -> List[Any]:
+    "the decks and duplicates.json of processed/, and the bible"
+    decks = sorted(_decks(processed)) + [_stat(processed / DUPLICATES)]
+    bible = [FLAGS.bible_text, FLAGS.bible_source, FLAGS.bible_word_god]
+    bible += [_stat(Path(FLAGS.bible_text)), _stat(Path(f"{FLAGS.bible_text}.csv"))]
+    return [decks, bible]
+
+
+def deck_key(service: Dict[str, Any], master_pptx: str, processed: Path) -> str:
+    digest = hashlib.sha256()
+    digest.update(json.dumps(service, sort_keys=True, ensure_ascii=False).encode("utf-8"))
+    digest.update(Path(master_pptx).read_bytes())
+    for path in CODE:
+        digest.update(path.read_bytes())
+    digest.update(json.dumps(corpus_version(processed)).encode("utf-8"))
+    return digest.hexdigest()
+
+
+@attr.s
+class DeckCache:
+    basedir: Path = attr.ib()
+    size: int = attr.ib()
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self.basedir / f"{key}.pptx"
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
+            return None
+        os.utime(path)  # most recently used
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        self.basedir.mkdir(parents=True, exist_ok=True)
+        path = self.basedir / f"{key}.pptx"
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+
+        decks = sorted(self.basedir.glob("*.pptx"), key=lambda p: p.stat().st_mtime, reverse=True)
+        for old in decks[self.size:]:
+            old.unlink(missing_ok=True)
+
+    def get_or_build(self, key: str, build: Callable[[], bytes]) -> bytes:
+        metrics.CACHE_REQUESTS.inc(cache="deck_file")
+        data = self.get(key)
+        if data is None:
+            metrics.CACHE_MISSES.inc(cache="deck_file")
+            data = build()
+            self.put(key, data)
+        else:
+            log.info(f"use the cached deck {key[:12]}")
+        return data
+
+
+def deck_cache() -> Optional[DeckCache]:
+    "None if --deck_cache_dir is empty"
+    if not FLAGS.deck_cache_dir:
+        return None
+    return DeckCache(Path(FLAGS.deck_cache_dir), FLAGS.deck_cache_size)
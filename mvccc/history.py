@@ -0,0 +1,199 @@
+"""Index of the Sunday services in services/*.flags: when a hymn was last sung, the most used hymns of a year and
+whether a passage was preached recently.
+
+Each flagfile is parsed once, into the catalog keys of its hymns (see hymns.catalog) and the verse key ranges of
+its citations (see bible.books.verse_key). The parsed services are kept in services/history.json with the mtime of
+their flagfile, so only new or edited services are parsed again.
+"""
+
+import json
+import os
+from collections import Counter
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple, TypeVar
+
+import attr
+import numpy as np
+from absl import app, flags, logging as log
+
+from base import initialize_logging
+from bible.books import verse_key
+from bible.index import parse_citations
+from hymns.catalog import CATALOG, PROCESSED, Catalog, catalog
+from hymns.fuzzy import normalize
+
+FLAGS = flags.FLAGS
+
+T = TypeVar("T")
+
+SERVICES = Path("services")
+HISTORY = "history.json"
+FORMAT = 2  # of the parsed services in history.json, they are parsed again when it is bumped
+HYMN_FLAGS = ["hymns", "choir", "response", "offering"]
+CITATION_FLAGS = ["scripture", "memorize"]
+
+
+class Service(NamedTuple):
+    date: str  # 2019-03-24, the name of the flagfile
+    hymns: List[str]  # catalog keys, or the normalized keyword of hymns not in the catalog
+    citations: List[Tuple[str, int, int]]  # (citation, verse key of the first verse, of the last verse)
+
+
+def parse_flagfile(path: Path) -> Dict[str, List[str]]:
+    "name => values of the --name=value lines, commented out and boolean flags are skipped"
+    values: Dict[str, List[str]] = {}
+    for line in path.read_text().splitlines():
+        line = line.strip()
+        if line.startswith("--") and "=" in line:
+            name, value = line[2:].split("=", 1)
+            if value:
+                values.setdefault(name, []).append(value)
+    return values
+
+
+def parse_service(path: Path, catalog: Catalog) -> Service:
+    values = parse_flagfile(path)
+
+    hymns = []
+    for name in HYMN_FLAGS:
+        for keyword in values.get(name, []):
+            record = catalog.resolve(keyword)
+            hymns.append(record.key if record else normalize(keyword))
+
+    citations = []
+    for name in CITATION_FLAGS:
+        for value in values.get(name, []):
+            try:
+                for cite_str, (book, cite_list) in parse_citations(value).items():
+                    for cite in cite_list:
+                        citations.append((cite_str, verse_key(book, cite.start), verse_key(book, cite.end)))
+            except (KeyError, ValueError):
+                log.exception(f"failed to parse --{name}={value} of {path}.")
+
+    return Service(path.stem, hymns, citations)
+
+
+@attr.s
+class History:
+    catalog: Catalog = attr.ib(repr=False)
+    services: List[Service] = attr.ib(repr=False)  # oldest first
+    sung: Dict[str, List[str]] = attr.ib(init=False, repr=False)  # hymn => dates, oldest first
+    # one row per cited range of every service
+    cite_dates: np.ndarray = attr.ib(init=False, repr=False)
+    cite_starts: np.ndarray = attr.ib(init=False, repr=False)
+    cite_ends: np.ndarray = attr.ib(init=False, repr=False)
+    cite_strs: List[str] = attr.ib(init=False, repr=False)
+
+    def __attrs_post_init__(self):
+        self.sung = {}
+        for service in self.services:
+            for hymn in dict.fromkeys(service.hymns):
+                self.sung.setdefault(hymn, []).append(service.date)
+
+        rows = [(service.date, *citation) for service in self.services for citation in service.citations]
+        self.cite_dates = np.array([row[0] for row in rows], dtype="datetime64[D]")
+        self.cite_strs = [row[1] for row in rows]
+        self.cite_starts = np.array([row[2] for row in rows], dtype=np.int64)
+        self.cite_ends = np.array([row[3] for row in rows], dtype=np.int64)
+
+    def hymn_key(self, keyword: str) -> str:
+        record = self.catalog.resolve(keyword)
+        return record.key if record else normalize(keyword)
+
+    def last_sung(self, keyword: str) -> Optional[str]:
+        dates = self.sung.get(self.hymn_key(keyword))
+        return dates[-1] if dates else None
+
+    def most_used(self, since: str = "", limit: int = 10) -> List[Tuple[str, int]]:
+        "[(hymn, count)] of the services since the date"
+        counts = Counter(hymn for hymn, dates in self.sung.items() for d in dates if d >= since)
+        return counts.most_common(limit)
+
+    def preached(self, citations: str, since: str = "") -> List[Tuple[str, str]]:
+        "[(date, citation)] of the services since the date whose scripture overlaps any of the citations"
+        mask = np.zeros(len(self.cite_strs), dtype=bool)
+        for _, (book, cite_list) in parse_citations(citations).items():
+            for cite in cite_list:
+                start, end = verse_key(book, cite.start), verse_key(book, cite.end)
+                mask |= (self.cite_starts <= end) & (self.cite_ends >= start)
+        if since:
+            mask &= self.cite_dates >= np.datetime64(since)
+
+        found = dict.fromkeys((str(self.cite_dates[idx]), self.cite_strs[idx]) for idx in np.flatnonzero(mask))
+        return sorted(found, reverse=True)
+
+    def usage(self, keyword: str, since: str) -> int:
+        return sum(d >= since for d in self.sung.get(self.hymn_key(keyword), ()))
+
+    def rank(self, hymns: Sequence[T], name=lambda hymn: hymn.filename, today: date = None) -> List[T]:
+        "hymns sung more often in the year before today first, the order of search results is kept otherwise"
+        if today is None:
+            today = date.today()
+        since = (today - timedelta(days=365)).isoformat()
+        return sorted(hymns, key=lambda hymn: -self.usage(name(hymn).replace(".pptx", ""), since))
+
+
+def history(services: Path = SERVICES, processed: Path = PROCESSED) -> History:
+    "parse the flagfiles which are new or changed since services/history.json, all of them if the catalog changed"
+    index = catalog(processed)
+    catalog_path = processed / CATALOG
+    version = [FORMAT, catalog_path.stat().st_mtime if catalog_path.exists() else 0]
+
+    cache_path = services / HISTORY
+    cached: Dict = {"catalog": version, "services": {}}
+    if cache_path.exists():
+        with cache_path.open() as f:
+            cached = json.load(f)
+    if cached["catalog"] != version:
+        cached = {"catalog": version, "services": {}}
+
+    entries = {}
+    with os.scandir(services) as it:
+        flagfiles = sorted((entry.name, entry.stat().st_mtime) for entry in it if entry.name.endswith(".flags"))
+    for name, mtime in flagfiles:
+        entry = cached["services"].get(name)
+        if entry is None or entry["mtime"] != mtime:
+            log.info(f"parse {services / name}")
+            entry = {"mtime": mtime, "service": parse_service(services / name, index)._asdict()}
+        entries[name] = entry
+
+    if entries != cached["services"]:
+        tmp = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+        with tmp.open("w") as out:
+            json.dump({"catalog": version, "services": entries}, out, ensure_ascii=False)
+        os.replace(tmp, cache_path)
+
+    service_list = []
+    for entry in entries.values():
+        service = entry["service"]
+        service_list.append(Service(service["date"], service["hymns"], [tuple(c) for c in service["citations"]]))
+    return History(index, service_list)
+
+
+def main(argv):
+    del argv
+    initialize_logging()
+
+    result = history()
+    if FLAGS.history_hymn:
+        print(f"{FLAGS.history_hymn} => {result.last_sung(FLAGS.history_hymn)}")
+    if FLAGS.history_citations:
+        for d, cite_str in result.preached(FLAGS.history_citations, since=FLAGS.history_since):
+            print(f"{d} {cite_str}")
+    if not FLAGS.history_hymn and not FLAGS.history_citations:
+        last = date.fromisoformat(result.services[-1].date)
+        since = FLAGS.history_since or (last - timedelta(days=365)).isoformat()
+        for key, count in result.most_used(since):
+            record = result.catalog.by_key.get(key)
+            print(f"{count:>3d} {key:<6} {record.title if record else ''}")
+
+
+if __name__ == "__main__":
+    flags.DEFINE_string("history_hymn", "", "show when the hymn was last sung")
+    flags.DEFINE_string("history_citations", "", "show when the passages were preached")
+    flags.DEFINE_string(
+        "history_since", "", "count the services since the date, the year before the last one by default"
+    )
+
+    app.run(main)
@@ -2,17 +2,27 @@
 
 # vim: set fileencoding=utf-8 :
 
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date, timedelta
+from io import BytesIO
 from pathlib import Path
 from pprint import pformat
-from typing import Dict, Generator, List, Tuple
+from typing import Any, Callable, Dict, Generator, List, Optional, Tuple
+from zipfile import ZIP_DEFLATED, ZipFile, ZipInfo
 
 import attr
 from pptx import Presentation
 
+import metrics
+import romanize
 from absl import app, flags, logging as log
+from base import initialize_logging, lazy, profiling, span, timed
 from bible.index import parse_citations
-from bible.scripture import BibleVerse, scripture
+from bible.scripture import BibleVerse, _load_scripture, scripture
+from hymns.fuzzy import INTERCHANGEABLES, _hymn_index, hymn_index
+from mvccc.deckcache import corpus_version, deck_cache, deck_key
 
 flags.DEFINE_bool("extract_only", False, "extract text from pptx")
 flags.DEFINE_string("pptx", "", "The pptx")
@@ -31,6 +41,10 @@ flags.DEFINE_string("messager", "", "The messager")
 
 flags.DEFINE_bool("communion", None, "Whether to have communion")
 
+flags.DEFINE_string("watch", None, "Keep running and rebuild --pptx whenever this flagfile of the service changes")
+flags.DEFINE_float("watch_interval", 0.2, "Seconds between checks of the flagfile in --watch mode")
+flags.DEFINE_integer("lookup_workers", 8, "Number of threads to look up hymns and scriptures concurrently")
+
 FLAGS = flags.FLAGS
 
 PROCESSED = "processed"
@@ -110,12 +124,12 @@ class Hymn:
             title_holder, paragraph_holder = slide.placeholders
             title_holder.text = title[0]
             # XXX: workaround alignment problem
-            paragraph[0] = padding + paragraph[0]
-            paragraph_holder.text = "\n".join(paragraph)
+            paragraph_holder.text = "\n".join([padding + paragraph[0]] + paragraph[1:])
 
         return ppt
 
 
+@timed("search_hymn_ppt")
 def search_hymn_ppt(keyword: str, basepath: Path = None) -> List[Hymn]:
     if basepath is None:
         basepath = Path(PROCESSED)
@@ -127,8 +141,7 @@ def search_hymn_ppt(keyword: str, basepath: Path = None) -> List[Hymn]:
 
     if not found:
         # interchangeability characters
-        interchangebles = [("你", "祢", "袮"), ("寶", "寳"), ("他", "祂"), ("于", "於"), ("牆", "墻")]
-        for t in interchangebles:
+        for t in INTERCHANGEABLES:
             for w in t:
                 if w not in ptn:
                     continue
@@ -140,7 +153,25 @@ def search_hymn_ppt(keyword: str, basepath: Path = None) -> List[Hymn]:
                     if found:
                         break
 
+    if not found and romanize.is_romanized(keyword):
+        found = hymn_index(basepath).search_romanized(keyword)
+
+    if not found:
+        # a typo in the keyword shouldn't abort the build, use the closest titles.
+        closest = hymn_index(basepath).search(keyword)
+        found = [path for d, path in closest if d == closest[0][0]]
+        if found:
+            log.warning(f"can not find anything match {ptn}, use the closest {[p.name for p in found]}.")
+
     assert found, f"can not find anything match {ptn}."
+    if len(found) > 1:
+        # numpy of hymns.dedup is only imported when there is something to collapse.
+        from hymns.dedup import duplicates
+
+        # drop the copies whose canonical version is found as well, a deck the keyword does not match is never used.
+        canonical = duplicates(basepath)
+        relative = [path.relative_to(basepath).as_posix() for path in found]
+        found = [path for path, rel in zip(found, relative) if canonical.get(rel) not in relative]
     if len(found) > 1:
         log.warn(f"found more than 1 files for {ptn}. {[p.as_posix() for p in found]}")
 
@@ -148,10 +179,11 @@ def search_hymn_ppt(keyword: str, basepath: Path = None) -> List[Hymn]:
 
     result: List[Hymn] = []
     for path in found:
-        ppt = Presentation(path.as_posix())
-        lyrics = list(extract_slides_text(ppt))
+        with span("extract_slides_text"):
+            ppt = Presentation(path.as_posix())
+            lyrics = list(extract_slides_text(ppt))
         hymn = Hymn(path.name, lyrics)
-        log.info(f"keyword={keyword}, lyrics=\n{pformat(hymn.lyrics)}")
+        log.debug("keyword=%s, lyrics=\n%s", keyword, lazy(pformat, hymn.lyrics))
         result.append(hymn)
 
     return result
@@ -187,10 +219,16 @@ class Scripture:
 
 
 def to_scripture(citations: str) -> Scripture:
-    bible = scripture()
+    if FLAGS.bible_shared:
+        # numpy is slow to import, only import it when a scripture is looked up.
+        from bible.shared import shared_scripture
+
+        bible = shared_scripture()
+    else:
+        bible = scripture()
     cite_verses = bible.search(parse_citations(citations).items())
     for cite, verses in cite_verses.items():
-        log.info(f"citation={cite}, verses=\n{pformat(verses)}")
+        log.debug("citation=%s, verses=\n%s", cite, lazy(pformat, verses))
 
     return Scripture(citations, cite_verses)
 
@@ -241,7 +279,27 @@ def mvccc_slides(
     response: str,
     offering: str,
     communion: bool,
+    search_hymn: Callable[[str], List[Hymn]] = None,
+    search_scripture: Callable[[str], Scripture] = None,
 ) -> List:
+    if search_hymn is None:
+        search_hymn = search_hymn_ppt
+    if search_scripture is None:
+        search_scripture = to_scripture
+
+    # resolve all the hymns and scriptures concurrently, the lookups are independent of each other.
+    hymn_keywords = ["聖哉聖哉聖哉", *hymns, choir, response, offering, "三一頌"]
+    if FLAGS.profile:
+        # cProfile only sees the thread it is enabled in, the lookups are in the profile only if they run inline.
+        found = {kw: search_hymn(kw)[0] for kw in hymn_keywords if kw}
+        scriptures = {cite: search_scripture(cite) for cite in (scripture, memorize)}
+    else:
+        with ThreadPoolExecutor(max_workers=FLAGS.lookup_workers) as executor:
+            hymn_futures = {kw: executor.submit(search_hymn, kw) for kw in hymn_keywords if kw}
+            scripture_futures = {cite: executor.submit(search_scripture, cite) for cite in (scripture, memorize)}
+        found = {kw: future.result()[0] for kw, future in hymn_futures.items()}
+        scriptures = {cite: future.result() for cite, future in scripture_futures.items()}
+
     slides = [
         Prelude("請儘量往前或往中間坐,並將手機關閉或關至靜音,預備心敬拜！", "silence_phone1.png"),
         Message(
@@ -250,41 +308,36 @@ def mvccc_slides(
                     哈巴谷書 2:20"""
         ),
     ]
-    hymn = search_hymn_ppt("聖哉聖哉聖哉")
-    slides.append(hymn[0])
+    slides.append(found["聖哉聖哉聖哉"])
 
     slides.append(Section("宣  召"))
 
     slides.append(Section("頌  讚"))
     for kw in hymns:
-        r = search_hymn_ppt(kw)
-        slides.append(r[0])
+        slides.append(found[kw])
 
     slides.append(Section("祈  禱"))
 
     slides.append(Section("讀  經"))
 
-    slides.append(to_scripture(scripture))
-    for cite, verses in to_scripture(memorize).cite_verses.items():
+    slides.append(scriptures[scripture])
+    for cite, verses in scriptures[memorize].cite_verses.items():
         slides.append(Memorize(cite, verses))
         break
     slides.append(Blank())
 
     slides.append(Section("獻  詩"))
     if choir:
-        hymn = search_hymn_ppt(choir)[0]
-        slides.append(hymn)
+        slides.append(found[choir])
 
     slides.append(Teaching("信息", f"「{message}」", f"{messager}"))
 
     slides.append(Section("回  應"))
     if response:
-        hymn = search_hymn_ppt(response)[0]
-        slides.append(hymn)
+        slides.append(found[response])
 
     if offering:
-        hymn = search_hymn_ppt(offering)[0]
-        slides.append(hymn)
+        slides.append(found[offering])
 
     slides.append(Section("奉 獻 禱 告"))
 
@@ -294,8 +347,7 @@ def mvccc_slides(
     slides.append(Section("歡 迎 您"))
     slides.append(Section("家 事 分 享"))
 
-    hymn = search_hymn_ppt("三一頌")[0]
-    slides.append(hymn)
+    slides.append(found["三一頌"])
 
     slides.append(Section("祝  福"))
     slides.append(Section("默  禱"))
@@ -304,23 +356,127 @@ def mvccc_slides(
     return slides
 
 
+@timed("to_pptx")
 def to_pptx(slides: List, master_slide: Presentation) -> Presentation:
     ppt = master_slide
 
     for slide in slides:
-        slide.add_to(ppt)
+        with span(f"{type(slide).__name__}.add_to"):
+            slide.add_to(ppt)
 
     return ppt
 
 
-# ------------------------------------------------------------------------------
+# the timestamp of every zip entry, python-pptx writes the time of saving.
+ZIP_EPOCH = (1980, 1, 1, 0, 0, 0)
 
 
-def main(argv):
-    del argv
+def reproducible_zip(data: bytes) -> bytes:
+    "the same entries in the same order with a fixed timestamp, so the same deck is always the same bytes"
+    out = BytesIO()
+    with ZipFile(BytesIO(data)) as src, ZipFile(out, "w", ZIP_DEFLATED) as dst:
+        for info in src.infolist():
+            entry = ZipInfo(info.filename, ZIP_EPOCH)
+            entry.create_system = 3  # unix, whatever the platform is
+            dst.writestr(entry, src.read(info), compress_type=ZIP_DEFLATED)
+    return out.getvalue()
+
+
+def pptx_bytes(ppt: Presentation) -> bytes:
+    "save ppt into memory instead of a file, identical slides give identical bytes"
+    buffer = BytesIO()
+    ppt.save(buffer)
+    with span("reproducible_zip"):
+        return reproducible_zip(buffer.getvalue())
+
 
+def deck_bytes(service: Dict[str, Any], master_pptx: str, **lookups: Callable) -> bytes:
+    "the deck of the service, read from --deck_cache_dir if it has been built from the same inputs"
+
+    def build() -> bytes:
+        slides = mvccc_slides(**service, **lookups)
+        return pptx_bytes(to_pptx(slides, Presentation(master_pptx)))
+
+    cache = deck_cache()
+    if cache is None:
+        return build()
+    return cache.get_or_build(deck_key(service, master_pptx, Path(PROCESSED)), build)
+
+
+# ------------------------------------------------------------------------------
+
+SERVICE_FLAGS = ["hymns", "scripture", "memorize", "message", "messager", "choir", "response", "offering", "communion"]
+
+
+def service_kwargs() -> Dict[str, Any]:
+    return {name: FLAGS[name].value for name in SERVICE_FLAGS}
+
+
+def reload_service(flagfile: str) -> Dict[str, Any]:
+    "re-read the service flags from flagfile, other flags are kept as is."
+    argv = FLAGS.read_flags_from_files([f"--flagfile={flagfile}"], force_gnu=False)
+    for name in SERVICE_FLAGS:
+        FLAGS[name].unparse()
+    FLAGS([sys.argv[0]] + argv, known_only=True)
+
+    return service_kwargs()
+
+
+def diff_slides(prev: List, curr: List) -> List[int]:
+    "indexes of slides in curr which are not the same as in prev"
+    changed = [idx for idx, slide in enumerate(curr) if idx >= len(prev) or prev[idx] != slide]
+    if len(prev) > len(curr):
+        changed.append(len(curr))
+    return changed
+
+
+def watch(flagfile: str, pptx: str, master_pptx: str, interval: float) -> None:
+    """Rebuild pptx whenever flagfile is saved.
+
+    Hymns and scriptures are memoized by keyword/citation, so a change of one section only looks up that section.
+    The memos are cleared when a rebuild finds a deck, duplicates.json or the bible changed since the last one.
+    """
+    search_hymn = metrics.count_cache("hymn", maxsize=None)(search_hymn_ppt)
+    search_scripture = metrics.count_cache("citation", maxsize=None)(to_scripture)
+    master = Path(master_pptx).read_bytes()
+
+    prev_slides: List = []
+    prev_mtime: Optional[float] = None
+    prev_version: Optional[List] = None
+    log.info(f"watching {flagfile} for changes ...")
+    while True:
+        try:
+            mtime = Path(flagfile).stat().st_mtime
+            if mtime != prev_mtime:
+                prev_mtime = mtime
+                start = time.perf_counter()
+                version = corpus_version(Path(PROCESSED))
+                if prev_version is not None and version != prev_version:
+                    for cached in (search_hymn, search_scripture, _hymn_index, _load_scripture):
+                        cached.cache_clear()
+                    log.info("the decks or the bible changed, look up all hymns and scriptures again.")
+                prev_version = version
+                slides = mvccc_slides(
+                    **reload_service(flagfile), search_hymn=search_hymn, search_scripture=search_scripture
+                )
+                changed = diff_slides(prev_slides, slides)
+                if changed:
+                    ppt = to_pptx(slides, Presentation(BytesIO(master)))
+                    with span("save"):
+                        Path(pptx).write_bytes(pptx_bytes(ppt))
+                    log.info(f"rebuilt {pptx} in {time.perf_counter() - start:.3f}s, changed slides={changed}")
+                else:
+                    log.info(f"{flagfile} saved without changes to the slides.")
+                prev_slides = slides
+        except Exception:  # NOQA
+            log.exception(f"failed to rebuild {pptx} from {flagfile}, waiting for the next change.")
+
+        time.sleep(interval)
+
+
+def build(pptx: str) -> None:
     if FLAGS.extract_only:
-        ppt = Presentation(FLAGS.pptx)
+        ppt = Presentation(pptx)
 
         for idx, text in extract_slides_text(ppt):
             title = '\n'.join(text[0])
@@ -328,20 +484,21 @@ def main(argv):
             print(f"{idx+1:02d} {title}\n{paragraph}\n")
         return
 
-    slides = mvccc_slides(
-        hymns=FLAGS.hymns,
-        scripture=FLAGS.scripture,
-        memorize=FLAGS.memorize,
-        message=FLAGS.message,
-        messager=FLAGS.messager,
-        choir=FLAGS.choir,
-        response=FLAGS.response,
-        offering=FLAGS.offering,
-        communion=FLAGS.communion,
-    )
-    master = Presentation(FLAGS.master_pptx)
-    ppt = to_pptx(slides, master)
-    ppt.save(FLAGS.pptx)
+    if FLAGS.watch:
+        watch(FLAGS.watch, pptx, FLAGS.master_pptx, FLAGS.watch_interval)
+        return
+
+    data = deck_bytes(service_kwargs(), FLAGS.master_pptx)
+    with span("save"):
+        Path(pptx).write_bytes(data)
+
+
+def main(argv):
+    del argv
+
+    initialize_logging()
+    with profiling():
+        build(FLAGS.pptx)
 
 
 if __name__ == "__main__":
@@ -1,24 +1,74 @@
 #!/usr/bin/env streamlit
 
 import hashlib
+import sys
 from io import StringIO
+from typing import Any, Dict, List
 
 import pandas as pd
 import streamlit as st
 from absl import flags
-from pptx import Presentation
 
-from mvccc.slides import Hymn, mvccc_slides, next_sunday, search_hymn_ppt, to_pptx, to_scripture
+import metrics
+from hymns.scores import scores
+from mvccc.history import history
+from mvccc.slides import Hymn, Scripture, deck_bytes, next_sunday, search_hymn_ppt, to_scripture
 
 FLAGS = flags.FLAGS
 
-FLAGS(["streamlit"])
+# flags after `streamlit run mvccc/slidesapp.py --`, e.g. --metrics_port
+FLAGS(["streamlit"] + sys.argv[1:], known_only=True)
+
+metrics.serve()
+
+# streamlit reruns the whole script on every change, memoize the lookups by their input so only the section whose
+# input changed is recomputed. st.experimental_memo is renamed to st.cache_data since streamlit 1.18.
+cache_data = getattr(st, "cache_data", None) or st.experimental_memo
+
+
+@cache_data
+def _cached_search_hymn_ppt(keyword: str) -> List[Hymn]:
+    metrics.CACHE_MISSES.inc(cache="hymn")
+    return search_hymn_ppt(keyword=keyword)
+
+
+def cached_search_hymn_ppt(keyword: str) -> List[Hymn]:
+    metrics.CACHE_REQUESTS.inc(cache="hymn")
+    return _cached_search_hymn_ppt(keyword)
+
+
+@cache_data
+def _cached_to_scripture(citations: str) -> Scripture:
+    metrics.CACHE_MISSES.inc(cache="citation")
+    return to_scripture(citations)
+
+
+def cached_to_scripture(citations: str) -> Scripture:
+    metrics.CACHE_REQUESTS.inc(cache="citation")
+    return _cached_to_scripture(citations)
+
+
+@cache_data(max_entries=32)
+def cached_deck(service: Dict[str, Any], master_pptx: str) -> bytes:
+    "the deck is keyed by the hash of its inputs, each session gets its own copy and nothing is written to disk."
+    metrics.CACHE_MISSES.inc(cache="deck")
+    # decks built before, by this or another process, are read from --deck_cache_dir.
+    return deck_bytes(service, master_pptx, search_hymn=cached_search_hymn_ppt, search_scripture=cached_to_scripture)
 
 
 def pick_hymn(keyword: str, label: str) -> Hymn:
-    hymns = search_hymn_ppt(keyword=keyword)
+    hymns = cached_search_hymn_ppt(keyword=keyword)
+    if all(keyword not in h.filename for h in hymns):
+        st.warning(f"找不到「{keyword}」，以下是最接近的詩歌。")
+    # the hymns sung recently first, with the date they were last sung.
+    services = history()
+    hymns = services.rank(hymns)
     hymn = st.radio(
-        "", hymns, index=0, format_func=lambda h: h.filename, key=hashlib.md5(label.encode("utf-8")).hexdigest()
+        "",
+        hymns,
+        index=0,
+        format_func=lambda h: f"{h.filename} ({services.last_sung(h.filename.replace('.pptx', '')) or '未唱過'})",
+        key=hashlib.md5(label.encode("utf-8")).hexdigest(),
     )
     sio = StringIO()
     for _, (title, lines) in hymn.lyrics:
@@ -27,6 +77,13 @@ def pick_hymn(keyword: str, label: str) -> Hymn:
         sio.write("\n")
     st.markdown(f"```\n{sio.getvalue()}\n```")
 
+    # the thumbnail of the zanmei score, written by `make scores`.
+    record, index = services.catalog.resolve(hymn.filename), scores()
+    for file in record.files.get("zanmei", []) if record and index else []:
+        thumbnail = index.thumbnail(file.path)
+        if thumbnail:
+            st.image(thumbnail, caption=f"{file.id} {file.title}")
+
     return hymn
 
 
@@ -37,7 +94,7 @@ messager = st.text_input("證道神仆", "劉志信牧师")
 citation = st.text_input("證道經文", "詩篇23:1-6")
 
 if citation:
-    scriptures = to_scripture(citation)
+    scriptures = cached_to_scripture(citation)
     for _, verses in scriptures.cite_verses.items():
         df = pd.DataFrame(verses)
         df["chapter_verse"] = df["chapter"].astype(str) + ":" + df["verse"].astype(str)
@@ -47,7 +104,7 @@ if citation:
 
 memorise = st.text_input("本週金句", "詩篇23:1")
 if memorise:
-    scriptures = to_scripture(memorise)
+    scriptures = cached_to_scripture(memorise)
     for _, verses in scriptures.cite_verses.items():
         st.table(pd.DataFrame(verses).set_index(["book", "chapter", "verse"]))
 
@@ -81,7 +138,7 @@ coming_sunday = next_sunday()
 is_first_week = int(coming_sunday[-2]) + int(coming_sunday[-1]) <= 7
 communion = st.checkbox("擘餠喝杯", value=is_first_week)
 
-deck = mvccc_slides(
+service = dict(
     hymns=[h.filename for h in hymns],
     scripture=citation,
     memorize=memorise,
@@ -95,8 +152,10 @@ deck = mvccc_slides(
 
 download = st.button("下載預覽")
 if download:
-    master = Presentation(FLAGS.master_pptx)
-    ppt = to_pptx(deck, master)
-    output_filename = f"{coming_sunday}.pptx"
-    ppt.save(output_filename)
-    st.markdown(f"[{output_filename}](/zanmei/{output_filename})")
+    metrics.CACHE_REQUESTS.inc(cache="deck")
+    st.download_button(
+        f"{coming_sunday}.pptx",
+        data=cached_deck(service, FLAGS.master_pptx),
+        file_name=f"{coming_sunday}.pptx",
+        mime="application/vnd.openxmlformats-officedocument.presentationml.presentation",
+    )
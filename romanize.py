@@ -0,0 +1,55 @@
+"""Pinyin and zhuyin search keys, so 最知心的朋友 is found by zuizhixin, zzxdpy or ㄗㄨㄟㄓㄒㄧㄣ.
+
+Every prefix of the full pinyin, the initials and the zhuyin of a text is a key, a lookup is one dict access.
+"""
+
+import re
+from typing import Dict, Iterable, List, Set, Tuple, TypeVar
+
+T = TypeVar("T")
+
+MIN_PREFIX = 2
+# tone marks of zhuyin, and separators people type between syllables.
+_NOISE = re.compile(r"[ˊˇˋ˙\s'’]+")
+_NON_WORD = re.compile(r"[\W_]+")
+
+
+def romanize(text: str) -> Tuple[str, str, str]:
+    "(full pinyin, initials, zhuyin) without tones, punctuation is dropped"
+    from pypinyin import Style, lazy_pinyin
+
+    text = _NON_WORD.sub("", text)
+    full = "".join(lazy_pinyin(text)).lower()
+    initials = "".join(lazy_pinyin(text, style=Style.FIRST_LETTER)).lower()
+    zhuyin = _NOISE.sub("", "".join(lazy_pinyin(text, style=Style.BOPOMOFO)))
+    return full, initials, zhuyin
+
+
+def search_keys(text: str) -> Set[str]:
+    "all prefixes of the romanized text which are long enough to be typed as a search"
+    keys = set()
+    for key in romanize(text):
+        keys.update(key[:end] for end in range(MIN_PREFIX, len(key) + 1))
+    return keys
+
+
+def normalize_query(query: str) -> str:
+    "Zui Zhi'xin => zuizhixin, ㄗㄨㄟˋㄓ => ㄗㄨㄟㄓ"
+    return _NOISE.sub("", query).lower()
+
+
+def is_romanized(query: str) -> bool:
+    "ascii letters or zhuyin, i.e. there is no chinese character to search for"
+    query = normalize_query(query)
+    return bool(query) and all(ch.isascii() or "ㄅ" <= ch <= "ㄯ" for ch in query)
+
+
+def build_index(items: Iterable[Tuple[str, T]]) -> Dict[str, List[T]]:
+    "search key => values whose text has the key, in the order of items"
+    index: Dict[str, List[T]] = {}
+    for text, value in items:
+        for key in search_keys(text):
+            values = index.setdefault(key, [])
+            if not values or values[-1] != value:  # several texts of the same value, e.g. name and abbreviation
+                values.append(value)
+    return index
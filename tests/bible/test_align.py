@@ -0,0 +1,55 @@
+from pathlib import Path
+
+import pytest
+from absl import flags
+
+from benchmarks import corpus
+from bible.align import DIFFER, MERGED, MISSING, Alignment
+from bible.books import from_key, verse_keys
+from bible.index import parse_citations
+from bible.scripture import from_bible_cloud, from_ibibles_net
+
+FLAGS = flags.FLAGS
+
+
+@pytest.fixture(autouse=True)
+def init():
+    FLAGS(["program"])
+
+
+def test_verse_keys():
+    keys = verse_keys(["創世記", "啟示錄"], 1, 1)
+    assert [from_key(key) for key in keys] == [("創世記", 1, 1), ("啟示錄", 1, 1)]
+
+
+def test_alignment(tmp_path):
+    layout = corpus.make_layout(seed=1, chapters=5, verses=10)
+    verses = list(corpus.make_verses(layout, seed=1))
+    # 3 verses of the same chapter
+    i = next(i for i in range(len(verses)) if verses[i].chapter == verses[i + 2].chapter)
+    changed = verses[:]
+    changed[i] = changed[i]._replace(text=changed[i].text + "！")  # punctuation only
+    changed[i + 1] = changed[i + 1]._replace(text="不同的經文")
+    del changed[i + 2]
+
+    books_txt = corpus.write_ibibles_net(tmp_path / "books.txt", verses, merged=0.01, seed=1).as_posix()
+    epub = corpus.write_bible_cloud(tmp_path / "CMNUNV.epub", changed).as_posix()
+    bn, bc = from_ibibles_net(books_txt), from_bible_cloud(epub)
+    alignment = Alignment.build({"ibibles.net": bn, "bible.cloud": bc})
+
+    assert len(alignment.keys) == len(verses)
+    diffs = {(v.book, v.chapter, v.verse): v.kind for v in alignment.diff()}
+    assert verses[i][:3] not in diffs
+    assert diffs[verses[i + 1][:3]] == DIFFER
+    assert diffs[verses[i + 2][:3]] == MISSING
+    assert MERGED in diffs.values()
+
+    cite = f"{verses[i].book}{verses[i].chapter}:{verses[i].verse}-{verses[i + 2].verse}"
+    parallel = alignment.parallel(parse_citations(cite)[cite])
+    assert [v.kind for v in parallel] == ["", DIFFER, MISSING]
+    assert parallel[1].texts == {"ibibles.net": verses[i + 1].text, "bible.cloud": "不同的經文"}
+
+    # loaded again from the csv cache, the merged verses are still merged.
+    assert Path(f"{books_txt}.csv").exists()
+    cached = Alignment.build({"ibibles.net": from_ibibles_net(books_txt), "bible.cloud": from_bible_cloud(epub)})
+    assert cached.diff() == alignment.diff()
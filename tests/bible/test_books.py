@@ -0,0 +1,48 @@
+from bible.books import AhoCorasick, extract_citations, find_citations, load_books
+from bible.index import parse_citations
+
+
+def test_aho_corasick():
+    matcher = AhoCorasick({"he": 1, "she": 2, "his": 3, "hers": 4})
+    assert sorted(matcher.finditer("ushers")) == [(1, 4, 2), (2, 4, 1), (2, 6, 4)]
+
+
+def test_find_citations():
+    assert len(load_books()) == 66
+
+    text = """主日信息：哥林多前書 6:12-13;10:23-24、31 以及 約翰壹書 2:20, 24-27。
+    Exact 1:2 is not Acts. See 1 John 3:16 and Jhn 14:6.
+    讀經：詩篇２３：１－６；羅馬書12:1-2。撒上17:31-49 再來3個人"""
+
+    assert [citation for _, _, citation in find_citations(text)] == [
+        "哥林多前書6:12-13;10:23-24、31",
+        "約翰壹書2:20,24-27",
+        "約翰壹書3:16",
+        "約翰福音14:6",
+        "詩篇23:1-6",
+        "羅馬書12:1-2",
+        "撒母耳記上17:31-49",
+    ]
+    assert extract_citations(text) == parse_citations(
+        "哥林多前書6:12-13;10:23-24,31;約翰壹書2:20,24-27;約翰壹書3:16;約翰福音14:6;詩篇23:1-6;羅馬書12:1-2;撒母耳記上17:31-49"
+    )
+    assert extract_citations("no citations") == {}
+
+
+def test_extract_ranges():
+    # ～ is ~ after NFKC, both are ranges like -.
+    for text in ["約翰福音3:16～18", "約翰福音3:16~18", "約翰福音 3:16 ~ 18"]:
+        (citations,) = extract_citations(f"讀經：{text}。").values()
+        assert citations == parse_citations("約翰福音3:16-18")["約翰福音3:16-18"]
+
+
+def test_extract_chapters():
+    text = "詩篇23；詩篇 121-122，羅馬書8:28- 以及 Psalms 1。約翰福音3:16 - 神愛世人，出3個人，詩23不是。"
+    assert [citation for _, _, citation in find_citations(text)] == [
+        "詩篇23",
+        "詩篇121-122",
+        "羅馬書8:28-",
+        "詩篇1",
+        "約翰福音3:16",
+    ]
+    assert extract_citations(text) == parse_citations("詩篇23;詩篇121-122;羅馬書8:28-;詩篇1;約翰福音3:16")
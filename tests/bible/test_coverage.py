@@ -0,0 +1,35 @@
+import numpy as np
+
+from bible.books import verse_key
+from bible.coverage import Coverage, Covered, VerseSpace
+from bible.index import VerseLoc
+
+
+def test_coverage(tmp_path):
+    # 創世記 1 has 5 verses, 2 has 3, 出埃及記 1 has 4.
+    keys = [verse_key("創世記", VerseLoc(1, v)) for v in range(1, 6)]
+    keys += [verse_key("創世記", VerseLoc(2, v)) for v in range(1, 4)]
+    keys += [verse_key("出埃及記", VerseLoc(1, v)) for v in range(1, 5)]
+    space = VerseSpace.build(keys[::-1])
+    assert len(space) == 12
+
+    services = Coverage.of_citations(space, ["創世記1:2-3", "創世記1:3-4;出埃及記1:4"])
+    assert services.bits.tolist() == [False, True, True, True] + [False] * 7 + [True]
+    # a whole chapter, a range across chapters and verses missing from the bible.
+    plan = Coverage.of_citations(space, ["創世記2", "創世記1:5-2:1", "出埃及記1:3-9"])
+    assert plan.count() == 6
+
+    both = services | plan
+    assert both.books() == [Covered("創世記", 0, 7, 8), Covered("出埃及記", 0, 2, 4)]
+    assert both.chapters() == [
+        Covered("創世記", 1, 4, 5),
+        Covered("創世記", 2, 3, 3),
+        Covered("出埃及記", 1, 2, 4),
+    ]
+    assert (services & plan).count() == 1
+    assert (plan - services).count() == 5
+    assert Coverage.empty(space).books()[0] == Covered("創世記", 0, 0, 8)
+
+    both.save(tmp_path / "coverage.npz")
+    loaded = Coverage.load(tmp_path / "coverage.npz")
+    assert np.array_equal(loaded.bits, both.bits) and np.array_equal(loaded.space.keys, space.keys)
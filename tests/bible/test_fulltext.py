@@ -0,0 +1,53 @@
+import pytest
+from absl import flags
+
+from benchmarks import corpus
+from bible.fulltext import FullTextIndex, load_or_build, normalize
+from bible.scripture import from_ibibles_net
+
+FLAGS = flags.FLAGS
+
+
+@pytest.fixture(autouse=True)
+def init():
+    FLAGS(["program"])
+
+
+@pytest.fixture
+def bible(tmp_path):
+    layout = corpus.make_layout(seed=1, chapters=5, verses=10)
+    verses = list(corpus.make_verses(layout, seed=1, word_god="\u3000神"))
+    return from_ibibles_net(corpus.write_ibibles_net(tmp_path / "books.txt", verses).as_posix())
+
+
+def test_normalize():
+    assert normalize("耶和華　神說：「要有光」，") == normalize("耶和華上帝說要有光") == "耶和華神說要有光"
+
+
+def test_phrase_search(bible):
+    index = FullTextIndex.build(bible)
+    book, chv = bible.df.index[42]
+    phrase = normalize(bible.df.iloc[42]["text"])[2:8]
+
+    result = index.search(phrase, limit=len(bible.df))
+    assert result
+    assert all(phrase in normalize(v.text) for _, v in result)
+    assert (book, chv // 1000, chv % 1000) in {(v.book, v.chapter, v.verse) for _, v in result}
+    assert [score for score, _ in result] == sorted((score for score, _ in result), reverse=True)
+
+    # every term has to match.
+    assert index.search(f"{phrase} 不存在的經文") == []
+
+
+def test_word_god(bible, tmp_path):
+    index = load_or_build(bible, (tmp_path / "books.txt").as_posix())
+    assert (tmp_path / "books.txt.fulltext.pkl").exists()
+
+    result = index.search("神", limit=5, word_god="上帝")
+    assert result
+    assert any("上帝" in v.text for _, v in result)
+    assert not any("\u3000神" in v.text for _, v in result)
+    assert len(index.search("上帝", limit=len(bible.df))) == len(index.search("神", limit=len(bible.df)))
+
+    cached = load_or_build(bible, (tmp_path / "books.txt").as_posix())
+    assert cached.postings.keys() == index.postings.keys()
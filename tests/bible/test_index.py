@@ -2,7 +2,7 @@ from collections import OrderedDict
 
 import pytest
 
-from bible.index import BookCitations, Citation, VerseLoc, parse_citations
+from bible.index import LAST_VERSE, BookCitations, Citation, VerseLoc, parse_citations, validate_citations
 
 
 def test_parse_citations():
@@ -106,3 +106,30 @@ def test_parse_citations():
             )
         ]
     )
+
+
+def test_parse_whole_chapters():
+    r = parse_citations("詩篇23,24")
+    assert r["詩篇23,24"].citations == [
+        Citation(VerseLoc(23, 1), VerseLoc(23, LAST_VERSE)),
+        Citation(VerseLoc(24, 1), VerseLoc(24, LAST_VERSE)),
+    ]
+    assert parse_citations("詩篇23-24:3")["詩篇23-24:3"].citations == [Citation(VerseLoc(23, 1), VerseLoc(24, 3))]
+    assert parse_citations("詩篇23:3-")["詩篇23:3-"].citations == [Citation(VerseLoc(23, 3), VerseLoc(23, LAST_VERSE))]
+
+
+def test_validate_citations():
+    verse_counts = {"詩篇": {23: 6, 24: 10}}
+
+    r = validate_citations(parse_citations("詩篇23-24")["詩篇23-24"], verse_counts)
+    assert r == BookCitations("詩篇", [Citation(VerseLoc(23, 1), VerseLoc(24, 10))])
+
+    for citations in ["詩篇23:7", "詩篇25", "詩篇24:3-23:1", "約翰福音3:16"]:
+        with pytest.raises(ValueError):
+            validate_citations(parse_citations(citations)[citations], verse_counts)
+
+
+def test_parse_romanized_books():
+    for book in ["詩篇", "詩", "Psalms", "psm", "shipian", "sp", "ㄕㄆㄧㄢ"]:
+        assert parse_citations(f"{book}23:1-6")[f"{book}23:1-6"].book == "詩篇"
+    assert parse_citations("yuehan3:16")["yuehan3:16"].book == "約翰福音"
@@ -2,6 +2,7 @@ import pandas as pd
 import pytest
 from absl import flags
 
+from benchmarks import corpus
 from bible.index import parse_citations
 from bible.scripture import from_bible_cloud, from_ibibles_net
 
@@ -52,3 +53,23 @@ def test_bible_search():
 
     assert len(result) == 1
     assert len(verses) == 5
+
+
+def test_synthetic_bible(tmp_path):
+    layout = corpus.make_layout(seed=1, chapters=5, verses=10)
+    verses = list(corpus.make_verses(layout, seed=1))
+    bc = from_bible_cloud(corpus.write_bible_cloud(tmp_path / "CMNUNV.epub", verses).as_posix())
+    bn = from_ibibles_net(corpus.write_ibibles_net(tmp_path / "books.txt", verses).as_posix())
+
+    assert len(set(bc.df.index.get_level_values(0))) == 66
+    assert len(bc.df) == len(bn.df) == sum(sum(chapters) for chapters in layout.values())
+    assert (bc.df["text"] == bn.df["text"]).all()
+
+    result = bc.search(parse_citations("創世記1:1-3").items(), word_god="上帝")
+    assert [bv.text for bv in result["創世記1:1-3"]] == [bv.text for bv in verses[:3]]
+
+    result = bn.search(parse_citations("創世記1-2").items())
+    assert len(result["創世記1-2"]) == layout["創世記"][0] + layout["創世記"][1]
+
+    with pytest.raises(ValueError):
+        bn.search(parse_citations(f"創世記1:{layout['創世記'][0] + 1}").items())
@@ -0,0 +1,36 @@
+import pytest
+from absl import flags
+
+from benchmarks import corpus
+from bible.index import parse_citations
+from bible.scripture import from_ibibles_net
+from bible.shared import SharedBible, shared_scripture, write_shared
+
+FLAGS = flags.FLAGS
+
+
+@pytest.fixture(autouse=True)
+def init():
+    FLAGS(["program"])
+
+
+def test_shared_bible(tmp_path):
+    layout = corpus.make_layout(seed=1, chapters=5, verses=10)
+    verses = list(corpus.make_verses(layout, seed=1, word_god="　神"))
+    filename = corpus.write_ibibles_net(tmp_path / "books.txt", verses).as_posix()
+    bible = from_ibibles_net(filename)
+
+    write_shared(bible, tmp_path / "books.txt.mmap")
+    shared = SharedBible.attach(tmp_path / "books.txt.mmap")
+    assert shared.word_god == bible.word_god
+    assert shared.verse_counts == bible.verse_counts
+
+    citations = parse_citations("創世記1:2-4;2;出埃及記1:1-2:2;啟示錄1")
+    for word_god in ["　神", "上帝"]:
+        assert shared.search(citations.items(), word_god) == bible.search(citations.items(), word_god)
+
+    with pytest.raises(ValueError):
+        shared.search(parse_citations("創世記99:1").items())
+
+    # written from scripture() once, attached afterwards.
+    assert shared_scripture(filename, "ibibles.net").search(citations.items()) == bible.search(citations.items())
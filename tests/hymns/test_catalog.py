@@ -0,0 +1,87 @@
+import os
+import random
+
+from hymns.catalog import Catalog, build_catalog, catalog, hymnal_no
+from hymns.dedup import Document, find_duplicates, save
+
+
+def test_hymnal_no():
+    assert hymnal_no("236") == 236
+    assert hymnal_no("488-1") is None
+    assert hymnal_no("1001") is None
+    assert hymnal_no("B94") is None
+
+
+def test_catalog(tmp_path):
+    download, processed = tmp_path / "download", tmp_path / "processed"
+    names = [
+        "download/zanmei/236_大哉聖哉耶穌尊名.png",
+        "download/zanmei/492_主的愛.png",
+        "processed/hoctoga/236_大哉聖哉耶穌尊名.raw.txt",
+        "processed/hoctoga/236_大哉聖哉耶穌尊名.errata.txt",
+        "processed/mvccc/236_大哉聖哉耶穌尊名2.pptx",
+        "processed/mvccc/488-1_獻上感恩的心.pptx",
+        "processed/mvccc/B94_聖名榮光.pptx",
+        "processed/mvccc_choir/2019-10-27-聖名榮光.pptx",
+        "processed/mvccc/愛的真諦.pptx",
+        "processed/mvccc/5087_愛的真締.pptx",
+    ]
+    for name in names:
+        (tmp_path / name).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / name).touch()
+    (processed / "fingerprints.json").write_text('{"mvccc/愛的真諦.pptx": "mvccc/5087_愛的真締.pptx"}')
+
+    catalog = build_catalog(download, processed)
+    path = processed / "catalog.json"
+    catalog.save(path)
+    catalog = Catalog.load(path)
+
+    (record,) = catalog.lookup("#236")
+    assert {source: [f.id for f in files] for source, files in record.files.items()} == {
+        "zanmei": ["236"],
+        "hoctoga": ["236"],
+        "mvccc": ["236"],
+    }
+    assert catalog.lookup("493")[0].files["zanmei"][0].id == "492"
+    assert catalog.lookup("488") == []
+    assert catalog.lookup("mvccc:488-1")[0].title == "獻上感恩的心"
+    assert catalog.resolve("齊來稱頌") is None
+    assert catalog.resolve("236_大哉聖哉耶穌尊名") == catalog.resolve("大哉聖哉") == catalog.lookup("236")[0]
+    # the id of a deck, or its title without the id.
+    assert catalog.resolve("488-1_獻上感恩的心.pptx") == catalog.lookup("mvccc:488-1")[0]
+    assert catalog.resolve("B94_聖名榮光") == catalog.resolve("2019-10-27-聖名榮光") == catalog.lookup("mvccc:B94")[0]
+    assert catalog.lookup("聖名榮光") == catalog.lookup("mvccc:B94")
+    assert len(catalog.lookup("mvccc:B94")[0].files["mvccc_choir"]) == 1
+    # joined by the lyrics, the titles are different.
+    assert catalog.lookup("愛的真諦") == catalog.lookup("mvccc:5087")
+    assert catalog.lookup("100") == []
+
+
+def test_catalog_fingerprints(tmp_path):
+    download, processed = tmp_path / "download", tmp_path / "processed"
+    rnd = random.Random(0)
+    lyrics = "".join(rnd.choice("主耶穌恩典慈愛天父聖靈榮耀讚美哈利路亞") for _ in range(200))
+    # the same lyrics under another title in another source.
+    paths = [processed / "hoctoga/236_大哉聖哉耶穌尊名.errata.txt", processed / "mvccc_choir/2020-02-16-主名最美.pptx"]
+    for path in paths:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.touch()
+    save(find_duplicates([Document(path, lyrics) for path in paths], 0.6), processed)
+
+    assert (processed / "duplicates.json").read_text() == "{}"
+    (record,) = build_catalog(download, processed).lookup("主名最美")
+    assert record.key == "236"
+    assert sorted(record.files) == ["hoctoga", "mvccc_choir"]
+
+
+def test_catalog_rebuilt(tmp_path):
+    download, processed = tmp_path / "download", tmp_path / "processed"
+    (processed / "mvccc").mkdir(parents=True)
+    (processed / "mvccc" / "236_大哉聖哉耶穌尊名.pptx").touch()
+    assert [record.key for record in catalog(processed, download).records] == ["236"]
+
+    # a deck added after the catalog was written.
+    (processed / "mvccc" / "B94_聖名榮光.pptx").touch()
+    mtime = (processed / "catalog.json").stat().st_mtime
+    os.utime(processed / "mvccc", (mtime + 1, mtime + 1))
+    assert [record.key for record in catalog(processed, download).records] == ["236", "聖名榮光"]
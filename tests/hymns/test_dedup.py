@@ -0,0 +1,46 @@
+import random
+from pathlib import Path
+
+import numpy as np
+
+from hymns.dedup import Document, MinHash, candidate_pairs, canonical, clusters, jaccard, shingles, similarity
+
+
+def test_minhash():
+    rnd = random.Random(0)
+    lyrics = ["".join(rnd.choice("主耶穌恩典慈愛天父聖靈榮耀讚美哈利路亞") for _ in range(200)) for _ in range(3)]
+    # a copy with a few words changed, e.g. 你 => 祢 and punctuation of another source.
+    edited = lyrics[0][:90] + "祢的" + lyrics[0][92:]
+
+    minhash = MinHash.create()
+    signatures = np.array([minhash.signature(text) for text in lyrics + [edited]])
+
+    assert similarity(signatures[0], signatures[3]) > 0.8
+    assert similarity(signatures[0], signatures[1]) < 0.5
+    assert (0, 3) in set(candidate_pairs(signatures))
+    assert sorted(map(sorted, clusters(signatures, 0.5))) == [[0, 3], [1], [2]]
+
+
+def test_clusters_exact():
+    rnd = random.Random(0)
+    long = "".join(rnd.choice("主耶穌恩典慈愛天父聖靈榮耀讚美哈利路亞") for _ in range(200))
+    # a short song whose lyrics are the first verse of a longer one is not a copy of it.
+    texts = [long, long[:90], long[:90] + "阿們"]
+    exact = [np.unique(shingles(text)) for text in texts]
+    signatures = np.array([MinHash.create().signature(text) for text in texts])
+
+    assert jaccard(exact[0], exact[0]) == 1.0
+    assert jaccard(exact[0], exact[1]) < 0.5
+    assert sorted(map(sorted, clusters(signatures, 0.6, exact))) == [[0], [1, 2]]
+
+
+def test_canonical():
+    docs = [
+        Document(Path("processed/hoctoga/005_這是天父世界.errata.txt"), "這是天父世界我要靜聽" * 2),
+        Document(Path("processed/mvccc/006_這是天父世界.pptx"), "這是天父世界我要靜聽"),
+        Document(Path("processed/mvccc_choir/這是天父世界.pptx"), "這是天父世界我要靜聽"),
+        Document(Path("processed/mvccc/005_這是天父世界.pptx"), "這是天父世界我要靜聽"),
+    ]
+    assert canonical(docs) == docs[3]
+    assert canonical(docs[:3]) == docs[1]
+    assert canonical(docs[:1]) == docs[0]
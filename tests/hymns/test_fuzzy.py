@@ -0,0 +1,42 @@
+import random
+from pathlib import Path
+
+from hymns.fuzzy import HymnIndex, levenshtein, normalize
+
+
+def test_levenshtein():
+    def dp(a, b):
+        prev = list(range(len(b) + 1))
+        for i, ca in enumerate(a, 1):
+            cur = [i]
+            for j, cb in enumerate(b, 1):
+                cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb)))
+            prev = cur
+        return prev[-1]
+
+    rnd = random.Random(0)
+    for _ in range(1000):
+        a = "".join(rnd.choice("主耶穌恩典") for _ in range(rnd.randint(0, 12)))
+        b = "".join(rnd.choice("主耶穌恩典") for _ in range(rnd.randint(0, 12)))
+        assert levenshtein(a, b) == dp(a, b)
+
+
+def test_hymn_index():
+    assert normalize("338_我願常見祢") == "我願常見你"
+
+    paths = [
+        Path("processed/mvccc/235_大哉聖哉耶穌尊名1.pptx"),
+        Path("processed/mvccc/236_大哉聖哉耶穌尊名2.pptx"),
+        Path("processed/mvccc/1006_我的心哪.pptx"),
+        Path("processed/mvccc/5087_愛的真締.pptx"),
+        Path("processed/mvccc_choir/愛的真諦.pptx"),
+    ]
+    index = HymnIndex.build(paths)
+
+    assert index.search("我的心阿") == [(1, paths[2])]
+    assert index.search("愛的真諦") == [(0, paths[4]), (1, paths[3])]
+    assert [d for d, _ in index.search("大哉聖哉耶蘇尊名")] == [2, 2]
+    assert index.search("我願常見你") == []
+
+    assert index.search_romanized("wodexin") == [paths[2]]
+    assert index.search_romanized("adzd") == [paths[3], paths[4]]
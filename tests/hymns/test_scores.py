@@ -0,0 +1,39 @@
+import numpy as np
+from PIL import Image, ImageDraw
+
+from hymns.scores import Scores, update
+
+
+def score_image(seed: int) -> Image.Image:
+    "staves and notes in black on white, saved as rgb like the downloaded scores"
+    rnd = np.random.default_rng(seed)
+    im = Image.new("RGB", (800, 1000), "white")
+    draw = ImageDraw.Draw(im)
+    for top in range(100, 1000, 200):
+        for y in range(top, top + 50, 10):
+            draw.line([(40, y), (760, y)], fill="black")
+        for x, y in zip(rnd.integers(60, 740, 20), rnd.integers(top - 10, top + 50, 20)):
+            draw.ellipse([(x, y), (x + 12, y + 9)], fill="black")
+    return im
+
+
+def test_scores(tmp_path):
+    score_image(0).save(tmp_path / "005_這是天父世界.png")
+    score_image(1).save(tmp_path / "236_大哉聖哉耶穌尊名.png")
+    # the same score downloaded again under another number, with a few pixels of noise.
+    copy = score_image(0)
+    copy.putpixel((400, 10), (0, 0, 0))
+    copy.save(tmp_path / "006_這是天父世界.png")
+
+    result = update(tmp_path, thumbnail_width=200, workers=1)
+    assert [score.no for score in result.scores] == [5, 6, 236]
+    assert all(score.error == "" and score.after < score.before for score in result.scores)
+    with Image.open(tmp_path / "005_這是天父世界.png") as im:
+        assert im.mode == "L" and im.size == (800, 1000)
+    with Image.open(result.thumbnail(result.scores[0].path)) as im:
+        assert im.size == (200, 250)
+
+    assert [(a.no, b.no) for a, b, _ in result.duplicates(max_distance=12)] == [(5, 6)]
+
+    # nothing changed, the index is read back as it is.
+    assert update(tmp_path, thumbnail_width=200, workers=1) == Scores.load(tmp_path / "scores.json") == result
@@ -0,0 +1,27 @@
+import zipfile
+
+from pptx import Presentation
+
+from hymns.slim import slim_file
+
+
+def test_slim(tmp_path):
+    ppt = Presentation()
+    for title, lyrics in [("#236大哉聖哉耶穌尊名(1)", "大哉聖哉耶穌尊名"), ("#236大哉聖哉耶穌尊名(2)", "萬王之王")]:
+        slide = ppt.slides.add_slide(ppt.slide_layouts[1])
+        slide.shapes.title.text = title
+        slide.placeholders[1].text = lyrics
+    path = tmp_path / "236_大哉聖哉耶穌尊名.pptx"
+    ppt.save(path.as_posix())
+    assert "docProps/thumbnail.jpeg" in zipfile.ZipFile(path).namelist()
+
+    result = slim_file(path, dry_run=True)
+    assert result.error == "" and result.after < result.before
+    assert path.stat().st_size == result.before
+
+    slim_file(path)
+    assert path.stat().st_size == result.after
+    assert "docProps/thumbnail.jpeg" not in zipfile.ZipFile(path).namelist()
+    slimmed = Presentation(path.as_posix())
+    assert [layout.name for layout in slimmed.slide_layouts] == ["Title and Content"]
+    assert [slide.shapes.title.text for slide in slimmed.slides] == ["#236大哉聖哉耶穌尊名(1)", "#236大哉聖哉耶穌尊名(2)"]
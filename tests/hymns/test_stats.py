@@ -0,0 +1,17 @@
+from hymns.catalog import Catalog, SourceFile
+from hymns.stats import coverage
+
+
+def test_coverage():
+    files = [
+        SourceFile("zanmei", "236", "大哉聖哉耶穌尊名", "download/zanmei/236_大哉聖哉耶穌尊名.png"),
+        SourceFile("hoctoga", "236", "大哉聖哉耶穌尊名", "processed/hoctoga/236_大哉聖哉耶穌尊名.errata.txt"),
+        SourceFile("hoc5", "236", "大哉聖哉耶穌尊名", "processed/hoc5/236_大哉聖哉耶穌尊名.raw.txt"),
+        SourceFile("mvccc", "236", "大哉聖哉耶穌尊名2", "processed/mvccc/236_大哉聖哉耶穌尊名2.pptx"),
+        SourceFile("mvccc", "1001", "野地的花", "processed/mvccc/1001_野地的花.pptx"),
+    ]
+    result = coverage(Catalog.build(files))
+
+    assert len(result) == 527
+    assert result[236] == {"lyrics": ["hoctoga", "hoc5"], "pptx": ["mvccc"], "score": ["zanmei"], "errata": ["hoctoga"]}
+    assert result[1] == {"lyrics": [], "pptx": [], "score": [], "errata": []}
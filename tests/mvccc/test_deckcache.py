@@ -0,0 +1,74 @@
+import os
+import zipfile
+from io import BytesIO
+
+import pytest
+from absl import flags
+
+from mvccc.deckcache import DeckCache, deck_key
+from mvccc.slides import reproducible_zip
+
+FLAGS = flags.FLAGS
+
+
+@pytest.fixture(autouse=True)
+def init():
+    FLAGS(["program"])
+
+
+def make_zip(date_time) -> bytes:
+    out = BytesIO()
+    with zipfile.ZipFile(out, "w") as z:
+        for name in ["[Content_Types].xml", "ppt/presentation.xml"]:
+            z.writestr(zipfile.ZipInfo(name, date_time), name)
+    return out.getvalue()
+
+
+def test_reproducible_zip():
+    first, second = make_zip((2019, 3, 24, 10, 0, 0)), make_zip((2020, 1, 5, 11, 30, 0))
+    assert first != second
+    assert reproducible_zip(first) == reproducible_zip(second)
+    with zipfile.ZipFile(BytesIO(reproducible_zip(first))) as z:
+        assert z.read("ppt/presentation.xml") == b"ppt/presentation.xml"
+
+
+def test_deck_cache(tmp_path):
+    cache = DeckCache(tmp_path, size=2)
+    built = []
+
+    def build(data):
+        built.append(data)
+        return data
+
+    assert cache.get_or_build("a", lambda: build(b"a")) == b"a"
+    assert cache.get_or_build("a", lambda: build(b"x")) == b"a"
+    assert built == [b"a"]
+
+    os.utime(tmp_path / "a.pptx", (1, 1))
+    cache.put("b", b"b")
+    cache.put("c", b"c")  # a is the least recently used
+    assert cache.get("a") is None
+    assert cache.get("b") == b"b" and cache.get("c") == b"c"
+
+
+def test_deck_key(tmp_path):
+    processed, master = tmp_path / "processed", tmp_path / "master.pptx"
+    (processed / "mvccc").mkdir(parents=True)
+    deck = processed / "mvccc" / "236_大哉聖哉耶穌尊名.pptx"
+    deck.write_bytes(b"236")
+    master.write_bytes(b"master")
+    service = {"hymns": ["236_大哉聖哉耶穌尊名"], "scripture": "詩篇23:1-6"}
+
+    key = deck_key(service, master.as_posix(), processed)
+    assert deck_key(dict(reversed(service.items())), master.as_posix(), processed) == key
+    assert deck_key({**service, "communion": True}, master.as_posix(), processed) != key
+
+    # rewritten in place, e.g. by `make slim`, the mtime of the directory is the same.
+    mtime = (processed / "mvccc").stat().st_mtime_ns
+    deck.write_bytes(b"236 slimmed")
+    os.utime(processed / "mvccc", ns=(mtime, mtime))
+    assert deck_key(service, master.as_posix(), processed) != key
+
+    key = deck_key(service, master.as_posix(), processed)
+    (processed / "duplicates.json").write_text("{}")
+    assert deck_key(service, master.as_posix(), processed) != key
@@ -0,0 +1,42 @@
+from datetime import date
+
+from hymns.catalog import Catalog, SourceFile
+from mvccc.history import history
+
+
+def test_history(tmp_path):
+    services, processed = tmp_path / "services", tmp_path / "processed"
+    services.mkdir()
+    processed.mkdir()
+    files = [
+        SourceFile("mvccc", "001", "齊來稱頌偉大之神", "processed/mvccc/001_齊來稱頌偉大之神.pptx"),
+        SourceFile("mvccc", "291", "我一生求主管理", "processed/mvccc/291_我一生求主管理.pptx"),
+        SourceFile("mvccc", "488-1", "獻上感恩的心", "processed/mvccc/488-1_獻上感恩的心.pptx"),
+    ]
+    Catalog.build(files).save(processed / "catalog.json")
+
+    (services / "2019-03-24.flags").write_text(
+        "--hymns=001_齊來稱頌偉大之神\n--hymns=敬拜萬世之王\n--scripture=申命記10:17;尼希米記9:32\n"
+        "--offering=我一生求主管理\n--response=488-1_獻上感恩的心\n--communion\n"
+    )
+    (services / "2019-04-07.flags").write_text("--hymns=齊來稱頌\n#--choir=榮耀歸主\n--scripture=約翰福音15:1,5,16\n")
+
+    result = history(services, processed)
+    assert result.last_sung("001_齊來稱頌偉大之神") == "2019-04-07"
+    assert result.last_sung("我一生求主管理") == "2019-03-24"
+    assert result.last_sung("榮耀歸主") is None
+    assert result.last_sung("獻上感恩的心") == result.last_sung("488-1_獻上感恩的心") == "2019-03-24"
+    assert result.most_used(limit=1) == [("1", 2)]
+    assert result.most_used(since="2019-04-01") == [("1", 1)]
+    assert result.preached("約翰福音15:2-5") == [("2019-04-07", "約翰福音15:1,5,16")]
+    assert result.preached("尼希米記9") == [("2019-03-24", "尼希米記9:32")]
+    assert result.preached("尼希米記9", since="2019-04-01") == []
+
+    names = ["291_我一生求主管理.pptx", "敬拜萬世之王.pptx", "001_齊來稱頌偉大之神.pptx"]
+    assert result.rank(names, name=lambda name: name, today=date(2019, 12, 1)) == [names[2], names[0], names[1]]
+
+    # only the changed flagfile is parsed again.
+    (services / "2019-04-07.flags").write_text("--hymns=我一生求主管理\n")
+    result = history(services, processed)
+    assert result.last_sung("我一生求主管理") == "2019-04-07"
+    assert result.last_sung("齊來稱頌偉大之神") == "2019-03-24"
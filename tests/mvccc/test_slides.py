@@ -0,0 +1,74 @@
+import threading
+
+import pytest
+from absl import flags
+from absl.testing import flagsaver
+
+from mvccc.slides import Hymn, Scripture, Section, diff_slides, mvccc_slides, reload_service
+
+FLAGS = flags.FLAGS
+
+SERVICE = dict(
+    hymns=["齊來稱頌", "敬拜萬世之王"],
+    scripture="詩篇23:1-6",
+    memorize="詩篇23:1",
+    message="我必不至缺乏",
+    messager="劉志信牧师",
+    choir="真神羔羊",
+    response="",
+    offering="獻上感恩的心",
+    communion=False,
+)
+
+
+@pytest.fixture(autouse=True)
+def init():
+    FLAGS(["program"])
+
+
+def test_lookups_inline_with_profile():
+    threads = set()
+
+    def search_hymn(keyword):
+        threads.add(threading.get_ident())
+        return [Hymn(f"{keyword}.pptx", [])]
+
+    def search_scripture(citations):
+        threads.add(threading.get_ident())
+        return Scripture(citations, {citations: []})
+
+    # cProfile only sees the calling thread.
+    with flagsaver.flagsaver(profile="prof.out"):
+        slides = mvccc_slides(**SERVICE, search_hymn=search_hymn, search_scripture=search_scripture)
+    assert threads == {threading.get_ident()}
+    assert [s.filename for s in slides if isinstance(s, Hymn)][:3] == ["聖哉聖哉聖哉.pptx", "齊來稱頌.pptx", "敬拜萬世之王.pptx"]
+
+
+def test_diff_slides():
+    prev = [Section("宣  召"), Hymn("001_齊來稱頌偉大之神.pptx", []), Section("祈  禱")]
+    assert diff_slides(prev, list(prev)) == []
+    assert diff_slides([], prev) == [0, 1, 2]
+    # added at the end.
+    assert diff_slides(prev, prev + [Section("讀  經")]) == [3]
+    # changed in the middle, e.g. another hymn.
+    assert diff_slides(prev, [prev[0], Hymn("291_我一生求主管理.pptx", []), prev[2]]) == [1]
+    # removed at the end, the index past the last slide marks the removed ones.
+    assert diff_slides(prev, prev[:2]) == [2]
+    # removed in the middle, the following slides are shifted.
+    assert diff_slides(prev, [prev[0], prev[2]]) == [1, 2]
+
+
+def test_reload_service(tmp_path):
+    flagfile = tmp_path / "2019-03-24.flags"
+    flagfile.write_text("--hymns=齊來稱頌\n--hymns=敬拜萬世之王\n--scripture=詩篇23:1-6\n--communion\n")
+    with flagsaver.flagsaver(master_pptx="other_master.pptx"):
+        service = reload_service(flagfile.as_posix())
+        assert service["hymns"] == ["齊來稱頌", "敬拜萬世之王"]
+        assert (service["scripture"], service["communion"]) == ("詩篇23:1-6", True)
+
+        # the flags removed from the flagfile are back to their defaults, the other flags are kept.
+        flagfile.write_text("--hymns=我一生求主管理\n--scripture=約翰福音3:16\n")
+        service = reload_service(flagfile.as_posix())
+        assert service["hymns"] == ["我一生求主管理"]
+        assert service["scripture"] == "約翰福音3:16" and not service["communion"]
+        assert FLAGS.master_pptx == "other_master.pptx"
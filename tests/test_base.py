@@ -0,0 +1,93 @@
+import json
+import logging
+import pstats
+import sys
+
+import pytest
+from absl import flags, logging as log
+from absl.testing import flagsaver
+
+import base
+from base import SPAN_SECONDS, JsonFormatter, lazy, log_every_n, profiling, span, timed
+
+FLAGS = flags.FLAGS
+
+
+@pytest.fixture(autouse=True)
+def init():
+    FLAGS(["program"])
+
+
+def observations(name: str) -> int:
+    obs = SPAN_SECONDS.values.get((("span", name),))
+    return obs.count if obs else 0
+
+
+def test_span():
+    @timed("test_timed")
+    def add(a, b):
+        return a + b
+
+    with span("test_span"):
+        assert add(1, 2) == 3
+    assert add.__name__ == "add"
+    assert observations("test_span") == observations("test_timed") == 1
+    # the trace events are only collected within profiling(trace=...).
+    assert base._trace_events is None
+
+
+def test_profiling(tmp_path):
+    profile, trace = tmp_path / "prof.out", tmp_path / "trace.json"
+    with profiling(profile.as_posix(), trace.as_posix()):
+        with span("test_outer"):
+            with span("test_inner"):
+                sorted(range(1000), reverse=True)
+    with span("test_after"):
+        pass
+
+    stats = pstats.Stats(profile.as_posix())
+    assert any(func == "<built-in method builtins.sorted>" for _, _, func in stats.stats)
+    with trace.open() as f:
+        events = json.load(f)["traceEvents"]
+    assert [e["name"] for e in events] == ["test_inner", "test_outer"]
+    assert all(e["ph"] == "X" and e["dur"] >= 0 for e in events)
+    assert base._trace_events is None
+
+
+def test_lazy():
+    calls = []
+
+    def expensive():
+        calls.append(1)
+        return "expensive"
+
+    log.debug("not formatted %s", lazy(expensive))
+    assert calls == []
+    assert str(lazy(lambda a, b=0: a + b, 1, b=2)) == "3"
+
+
+def test_json_formatter():
+    try:
+        raise ValueError("bad verse")
+    except ValueError:
+        exc_info = sys.exc_info()
+    record = logging.LogRecord("absl", logging.ERROR, "slides.py", 42, "failed %s\nline 2", ("約翰福音",), exc_info)
+
+    line = JsonFormatter().format(record)
+    assert "\n" not in line
+    d = json.loads(line)
+    assert (d["level"], d["file"], d["line"], d["message"]) == ("ERROR", "slides.py", 42, "failed 約翰福音\nline 2")
+    assert "ValueError: bad verse" in d["exception"]
+
+
+def test_log_every_n(caplog):
+    with flagsaver.flagsaver(log_every_n=2), caplog.at_level(logging.INFO):
+        for i in range(3):
+            log_every_n(log.INFO, "first %d", i)
+            log_every_n(log.INFO, "second %d", i)
+
+    records = [r for r in caplog.records if r.getMessage().startswith(("first", "second"))]
+    # the counter is per call site, and the file:line is the caller's.
+    assert [r.getMessage() for r in records] == ["first 0", "second 0", "first 2", "second 2"]
+    assert {r.filename for r in records} == {"test_base.py"}
+    assert records[0].lineno + 1 == records[1].lineno
@@ -0,0 +1,54 @@
+import threading
+
+from metrics import CACHE_MISSES, CACHE_REQUESTS, Registry, count_cache
+
+
+def test_render():
+    registry = Registry()
+    registry.counter("http_fetched_bytes_total", "bytes").inc(10, host="a.org")
+    registry.counter("http_fetched_bytes_total").inc(5, host="a.org")
+    histogram = registry.histogram("fetch_seconds", "latency", buckets=(0.1, 1.0))
+    histogram.observe(0.05, host="a.org")
+    histogram.observe(0.5, host="a.org")
+    histogram.observe(5, host="a.org")
+
+    lines = registry.render().splitlines()
+    assert 'http_fetched_bytes_total{host="a.org"} 15' in lines
+    assert 'fetch_seconds_bucket{host="a.org",le="0.1"} 1' in lines
+    assert 'fetch_seconds_bucket{host="a.org",le="1"} 2' in lines
+    assert 'fetch_seconds_bucket{host="a.org",le="+Inf"} 3' in lines
+    assert 'fetch_seconds_count{host="a.org"} 3' in lines
+
+
+def test_count_cache():
+    square = count_cache("test_square")(lambda x: x * x)
+    assert [square(x) for x in (1, 2, 1, 1)] == [1, 4, 1, 1]
+    assert CACHE_REQUESTS.value(cache="test_square") == 4
+    assert CACHE_MISSES.value(cache="test_square") == 2
+
+
+def test_count_cache_clear():
+    square = count_cache("test_clear")(lambda x: x * x)
+    square(1)
+    square.cache_clear()
+    square(1)
+    square.cache_clear()
+    assert [square(1), square(2)] == [1, 4]
+    assert CACHE_REQUESTS.value(cache="test_clear") == 4
+    assert CACHE_MISSES.value(cache="test_clear") == 4
+
+
+def test_count_cache_threads():
+    @count_cache("test_threads")
+    def lookup(x):
+        if x < 0:
+            # another thread misses during this call.
+            thread = threading.Thread(target=lookup, args=(-x,))
+            thread.start()
+            thread.join()
+            return lookup(0)
+        return x * x
+
+    assert [lookup(0), lookup(-2), lookup(2)] == [0, 0, 4]
+    assert CACHE_REQUESTS.value(cache="test_threads") == 5
+    assert CACHE_MISSES.value(cache="test_threads") == lookup.cache_info().misses == 3
@@ -0,0 +1,15 @@
+from romanize import build_index, is_romanized, normalize_query, romanize
+
+
+def test_romanize():
+    assert romanize("最知心的朋友") == ("zuizhixindepengyou", "zzxdpy", "ㄗㄨㄟㄓㄒㄧㄣㄉㄜㄆㄥㄧㄡ")
+    assert normalize_query("Zui Zhi'xin") == "zuizhixin"
+    assert is_romanized("zzxdpy") and is_romanized("ㄗㄨㄟˋ") and not is_romanized("最知心")
+
+
+def test_build_index():
+    index = build_index([("最知心的朋友", 1), ("最好的朋友", 2), ("罪得赦免", 3)])
+    assert index["zzxdpy"] == [1]
+    assert index["zuizhixin"] == [1]
+    assert index["zui"] == [1, 2, 3]
+    assert "z" not in index  # too short